@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,19 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def inline_background_tasks(settings):
+    """Фоновые задачи выполняются сразу после коммита, без воркера."""
+    settings.TASKS_EAGER = True
+
+
+@pytest.fixture(autouse=True)
+def local_memory_cache(settings):
+    """Кэш в памяти вместо общего файла кэша сервера."""
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
@@ -0,0 +1,174 @@
+'''Кэш с поколениями ключей.
+
+Каждая область (лента, группа, автор, пост) хранит номер поколения.
+Ключ кэша включает поколения всех областей, от которых зависит
+значение, поэтому для сброса достаточно увеличить номер поколения:
+старые записи больше не читаются и вытесняются сами. Это позволяет
+держать записи часами, не показывая устаревшие данные.
+
+Счётчики попаданий, промахов и сбросов хранятся в памяти процесса, а
+не в кэше: иначе каждое чтение из общего кэша было бы записью в него.
+Они отдаются на /metrics вместе с гистограммами профилировщика.
+'''
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+from .replicas import reading_replica
+
+TIMEOUT = 60 * 60 * 6
+VERSION_PREFIX = 'version'
+STATS = ('hits', 'misses', 'invalidations')
+LOCK_PREFIX = 'lock'
+# Сколько секунд пересчёт держит блокировку и сколько его ждут другие.
+LOCK_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+# Чем больше, тем раньше до истечения срока начинается пересчёт.
+EARLY_REFRESH_BETA = 1.0
+
+
+def scope(name, value):
+    '''Имя области кэша, например scope('post', 1) -> 'post:1'.'''
+    return f'{name}:{value}'
+
+
+def _version_key(name):
+    return f'{VERSION_PREFIX}:{name}'
+
+
+def _fresh_version():
+    # Поколение, вытесненное из кэша, начинается заново со значения,
+    # которое не могло встречаться раньше.
+    return time.time_ns()
+
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(stat, delta=1):
+    with _stats_lock:
+        _stats[stat] += delta
+
+
+def versions(scopes):
+    '''Возвращает текущие поколения областей scopes.'''
+    keys = [_version_key(name) for name in scopes]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, _fresh_version(), None)
+        found.update(cache.get_many(missing))
+    return [found.get(key, 0) for key in keys]
+
+
+def make_key(name, scopes, *parts):
+    '''Ключ значения name, зависящего от scopes и произвольных parts.'''
+    raw = ':'.join(str(part) for part in (*versions(scopes), *parts))
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'{name}:{digest}'
+
+
+def bump(*scopes):
+    '''Сбрасывает всё, что закэшировано для областей scopes.'''
+    for name in scopes:
+        key = _version_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), None)
+    _count('invalidations', len(scopes))
+
+
+def get(key):
+    value = cache.get(key)
+    _count('hits' if value is not None else 'misses')
+    return value
+
+
+def set(key, value, timeout=TIMEOUT):
+    # Данные реплики могут отставать от поколения в ключе.
+    if not reading_replica():
+        cache.set(key, value, timeout)
+
+
+def get_or_set(key, producer, timeout=TIMEOUT):
+    '''Возвращает значение из кэша или вычисляет и сохраняет его.'''
+    value = get(key)
+    if value is None:
+        value = producer()
+        set(key, value, timeout)
+    return value
+
+
+def _expired(entry, beta):
+    # Вероятностный ранний пересчёт (XFetch): чем дольше считается
+    # значение и чем ближе срок, тем вероятнее пересчёт до срока.
+    _, expires, delta = entry
+    return time.time() - delta * beta * math.log(1 - random.random()) >= (
+        expires
+    )
+
+
+def _wait(key):
+    '''Ждёт, пока другой процесс посчитает значение key.'''
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if cache.get(f'{LOCK_PREFIX}:{key}') is None:
+            return None
+    return None
+
+
+def get_or_compute(key, producer, timeout=TIMEOUT,
+                   beta=EARLY_REFRESH_BETA):
+    '''Как get_or_set, но значение одновременно считает один процесс.
+
+    При промахе остальные ждут его результата, а пока идёт пересчёт
+    устаревшего значения, отдают устаревшее. Свежее значение с
+    растущей к концу срока вероятностью пересчитывается заранее.
+    '''
+    entry = get(key)
+    if entry is not None and not _expired(entry, beta):
+        return entry[0]
+    lock = f'{LOCK_PREFIX}:{key}'
+    locked = cache.add(lock, 1, LOCK_TIMEOUT)
+    if not locked:
+        if entry is None:
+            entry = _wait(key)
+        if entry is not None:
+            return entry[0]
+    try:
+        start = time.monotonic()
+        value = producer()
+        delta = time.monotonic() - start
+        # Запись живёт дольше срока свежести, чтобы её можно было
+        # отдавать во время пересчёта.
+        if not reading_replica():
+            cache.set(
+                key, (value, time.time() + timeout, delta), timeout * 2
+            )
+    finally:
+        if locked:
+            cache.delete(lock)
+    return value
+
+
+def stats():
+    '''Счётчики попаданий, промахов и сбросов с запуска процесса.'''
+    with _stats_lock:
+        return {stat: _stats[stat] for stat in STATS}
+
+
+def clear_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,261 @@
+'''Общий для всех процессов кэш в файле SQLite.
+
+LocMemCache у каждого воркера свой: попадания делятся на число
+воркеров, а память дублируется. SQLiteCache хранит записи в одном
+файле, который читают и пишут все процессы сервера; соединения
+настраиваются как в core.sqlite (WAL, mmap, ожидание блокировки).
+
+Размер кэша ограничен числом записей (MAX_ENTRIES) и суммарным
+размером значений в байтах (MAX_SIZE). При превышении сначала
+удаляются просроченные записи, затем давно не читавшиеся (LRU).
+'''
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .sqlite import DEFAULT_TIMEOUT as CONNECT_TIMEOUT
+from .sqlite import PRAGMAS, execute_pragmas
+
+MAX_SIZE = 64 * 1024 * 1024
+# Время последнего чтения обновляется не чаще раза в секунду, чтобы
+# каждое чтение не становилось записью.
+ACCESS_RESOLUTION = 1.0
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, '
+    'accessed REAL NOT NULL, size INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed_idx ON cache (accessed)',
+    # Число записей и их суммарный размер ведут триггеры, чтобы
+    # проверка лимитов при записи не сканировала таблицу.
+    'CREATE TABLE IF NOT EXISTS cache_totals ('
+    'id INTEGER PRIMARY KEY CHECK (id = 0), '
+    'count INTEGER NOT NULL, size INTEGER NOT NULL)',
+    'CREATE TRIGGER IF NOT EXISTS cache_inserted AFTER INSERT ON cache '
+    'BEGIN UPDATE cache_totals SET count = count + 1, '
+    'size = size + new.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_updated AFTER UPDATE OF size '
+    'ON cache BEGIN UPDATE cache_totals SET '
+    'size = size - old.size + new.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_deleted AFTER DELETE ON cache '
+    'BEGIN UPDATE cache_totals SET count = count - 1, '
+    'size = size - old.size; END',
+    'INSERT OR IGNORE INTO cache_totals '
+    'SELECT 0, count(*), coalesce(sum(size), 0) FROM cache',
+)
+UPSERT = (
+    'INSERT INTO cache (key, value, expires, accessed, size) '
+    'VALUES (?, ?, ?, ?, ?) '
+    'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+    'expires = excluded.expires, accessed = excluded.accessed, '
+    'size = excluded.size'
+)
+LIVE = '(expires IS NULL OR expires > ?)'
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', MAX_SIZE))
+        self._local = threading.local()
+
+    def _connection(self):
+        # После fork соединение родителя использовать нельзя.
+        if getattr(self._local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=CONNECT_TIMEOUT, isolation_level=None
+            )
+            execute_pragmas(connection, PRAGMAS)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+            with self._write() as connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+        return self._local.connection
+
+    @contextmanager
+    def _write(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dump(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _touch_accessed(self, connection, keys, now):
+        if not keys:
+            return
+        # Чтение не ждёт писателей: пока запись занята, время чтения не
+        # обновляется и LRU просто становится чуть менее точным.
+        connection.execute('PRAGMA busy_timeout = 0')
+        try:
+            connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key IN '
+                f'({", ".join("?" * len(keys))})',
+                [now, *keys]
+            )
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            connection.execute(
+                f'PRAGMA busy_timeout = {PRAGMAS["busy_timeout"]}'
+            )
+
+    def get_many(self, keys, version=None):
+        names = {self._key(key, version): key for key in keys}
+        if not names:
+            return {}
+        now = time.time()
+        connection = self._connection()
+        rows = connection.execute(
+            'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({", ".join("?" * len(names))}) AND {LIVE}',
+            [*names, now]
+        ).fetchall()
+        self._touch_accessed(connection, [
+            key for key, _, accessed in rows
+            if now - accessed > ACCESS_RESOLUTION
+        ], now)
+        return {names[key]: pickle.loads(value) for key, value, _ in rows}
+
+    def get(self, key, default=None, version=None):
+        found = self.get_many([key], version)
+        return found[key] if found else default
+
+    def _totals(self, connection):
+        return connection.execute(
+            'SELECT count, size FROM cache_totals'
+        ).fetchone()
+
+    def _cull(self, connection, now):
+        count, size = self._totals(connection)
+        if count <= self._max_entries and size <= self._max_size:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            [now]
+        )
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        count, size = self._totals(connection)
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed LIMIT ?)',
+                [count // self._cull_frequency]
+            )
+            count, size = self._totals(connection)
+        if size > self._max_size:
+            # Остаются самые свежие записи, суммарно не больше target.
+            target = self._max_size - self._max_size // self._cull_frequency
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM ('
+                'SELECT key, sum(size) OVER (ORDER BY accessed DESC) '
+                'AS kept FROM cache) WHERE kept > ?)',
+                [target]
+            )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = []
+        for key, value in data.items():
+            value = self._dump(value)
+            rows.append(
+                (self._key(key, version), value, expires, now, len(value))
+            )
+        with self._write() as connection:
+            connection.executemany(UPSERT, rows)
+            self._cull(connection, now)
+        return []
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        value = self._dump(value)
+        now = time.time()
+        with self._write() as connection:
+            added = connection.execute(
+                f'{UPSERT} WHERE cache.expires IS NOT NULL '
+                'AND cache.expires <= ?',
+                [
+                    key, value, self.get_backend_timeout(timeout), now,
+                    len(value), now,
+                ]
+            ).rowcount
+            if added:
+                self._cull(connection, now)
+        return bool(added)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            return bool(connection.execute(
+                f'UPDATE cache SET expires = ? WHERE key = ? AND {LIVE}',
+                [self.get_backend_timeout(timeout), key, time.time()]
+            ).rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            row = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {LIVE}',
+                [key, time.time()]
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            dumped = self._dump(value)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                [dumped, len(dumped), key]
+            )
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection().execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {LIVE}',
+            [key, time.time()]
+        ).fetchone() is not None
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            with self._write() as connection:
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN '
+                    f'({", ".join("?" * len(keys))})',
+                    keys
+                )
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи фоновой очереди.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=2,
+            help='Число потоков, выполняющих задачи.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=tasks.POLL_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться.'
+        )
+
+    def handle(self, *args, threads, poll_interval, once, **options):
+        if once:
+            done = tasks.run_pending()
+            self.stdout.write(self.style.SUCCESS(
+                f'Выполнено задач: {done}.'
+            ))
+            return
+        self.stdout.write(f'Воркер запущен, потоков: {threads}.')
+        try:
+            tasks.work(threads, poll_interval=poll_interval)
+        except KeyboardInterrupt:
+            self.stdout.write('Воркер остановлен.')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core import sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность одновременных читателей и '
+        'писателей SQLite с PRAGMA из SQLITE_PRAGMAS и без них.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--seconds', type=float, default=5,
+            help='Длительность каждого прогона.'
+        )
+
+    def handle(self, *args, readers, writers, seconds, **options):
+        runs = {'default': {}, 'tuned': sqlite.pragmas()}
+        for name, values in runs.items():
+            summary = sqlite.benchmark(values, readers, writers, seconds)
+            self.stdout.write(f'{name}: ' + ', '.join(
+                f'{key} {value}' for key, value in summary.items()
+            ))
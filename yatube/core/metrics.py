@@ -0,0 +1,92 @@
+'''Гистограммы времени и числа запросов в памяти процесса.
+
+Значения копятся по имени представления и отдаются в текстовом формате
+Prometheus: на странице /metrics и периодически в лог core.profiler.
+'''
+import bisect
+import threading
+
+TIME_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+METRICS = {
+    'request_seconds': ('Полное время обработки запроса.', TIME_BUCKETS),
+    'sql_seconds': ('Время запросов к базе данных.', TIME_BUCKETS),
+    'sql_queries': ('Число запросов к базе данных.', COUNT_BUCKETS),
+    'template_seconds': ('Время отрисовки шаблонов.', TIME_BUCKETS),
+}
+PREFIX = 'yatube'
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    '''Гистограммы METRICS для каждого представления.'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, view, **values):
+        with self._lock:
+            for metric, value in values.items():
+                key = (metric, view)
+                if key not in self._histograms:
+                    self._histograms[key] = Histogram(METRICS[metric][1])
+                self._histograms[key].observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        '''Все гистограммы в текстовом формате Prometheus.'''
+        lines = []
+        with self._lock:
+            for metric, (help_text, buckets) in METRICS.items():
+                name = f'{PREFIX}_{metric}'
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (key, view), histogram in sorted(
+                    self._histograms.items()
+                ):
+                    if key != metric:
+                        continue
+                    label = f'view="{view}"'
+                    for bound, total in histogram.cumulative():
+                        lines.append(
+                            f'{name}_bucket{{{label},le="{bound}"}} {total}'
+                        )
+                    lines.append(f'{name}_sum{{{label}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{label}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def render_counters(metric, help_text, label, values):
+    '''Счётчики values в текстовом формате Prometheus.'''
+    name = f'{PREFIX}_{metric}_total'
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+    for key, value in values.items():
+        lines.append(f'{name}{{{label}="{key}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
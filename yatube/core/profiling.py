@@ -0,0 +1,126 @@
+'''Выборочное профилирование запросов в продакшене.
+
+ProfilerMiddleware замеряет долю PROFILER_SAMPLE_RATE запросов: полное
+время, число и время SQL-запросов и время отрисовки шаблонов. Замеры
+копятся в core.metrics по имени представления (например, posts:index).
+Для остальных запросов middleware только бросает жребий.
+
+Время шаблонов считает бэкенд ProfiledTemplates, который подключается
+в TEMPLATES вместо DjangoTemplates.
+'''
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import registry
+
+logger = logging.getLogger('core.profiler')
+
+SAMPLE_RATE = 0.1
+LOG_INTERVAL = 60
+UNRESOLVED = 'unresolved'
+
+_local = threading.local()
+_last_log = time.monotonic()
+_log_lock = threading.Lock()
+
+
+class Profile:
+    '''Замеры одного запроса.'''
+
+    def __init__(self):
+        self.sql_queries = 0
+        self.sql_seconds = 0
+        self.template_seconds = 0
+        self.rendering = False
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - start
+            self.sql_queries += 1
+
+
+def current_profile():
+    return getattr(_local, 'profile', None)
+
+
+class ProfiledTemplate(Template):
+    def render(self, context=None, request=None):
+        profile = current_profile()
+        if profile is None or profile.rendering:
+            return super().render(context, request)
+        profile.rendering = True
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_seconds += time.perf_counter() - start
+            profile.rendering = False
+
+
+class ProfiledTemplates(DjangoTemplates):
+    '''DjangoTemplates, замеряющий отрисовку в профилируемых запросах.'''
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(
+            self.engine.from_string(template_code), self
+        )
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return ProfiledTemplate(template.template, self)
+
+
+def _log_metrics():
+    global _last_log
+    interval = getattr(settings, 'PROFILER_LOG_INTERVAL', LOG_INTERVAL)
+    now = time.monotonic()
+    with _log_lock:
+        if now - _last_log < interval:
+            return
+        _last_log = now
+    logger.info('%s', registry.render())
+
+
+class ProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, 'PROFILER_SAMPLE_RATE', SAMPLE_RATE)
+        if random.random() >= rate:
+            return self.get_response(request)
+        return self.profile(request)
+
+    def profile(self, request):
+        profile = Profile()
+        _local.profile = profile
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        match = request.resolver_match
+        registry.observe(
+            match.view_name if match else UNRESOLVED,
+            request_seconds=time.perf_counter() - start,
+            sql_seconds=profile.sql_seconds,
+            sql_queries=profile.sql_queries,
+            template_seconds=profile.template_seconds,
+        )
+        _log_metrics()
+        return response
@@ -0,0 +1,93 @@
+'''Чтение лент с реплик базы данных.
+
+ReplicaMiddleware отмечает запросы, которые можно обслужить с реплики:
+GET и HEAD к представлениям приложения posts, не помеченным
+декоратором primary. ReplicaRouter отправляет чтение таких запросов на
+случайную реплику из REPLICA_DATABASES, всё остальное, включая любую
+запись, идёт в основную базу.
+
+После записи (небезопасный метод или представление с @primary)
+пользователь получает cookie, и следующие REPLICA_PIN_SECONDS секунд
+его запросы читают из основной базы: реплика может ещё не получить
+его изменения.
+
+Прочитанное с реплики не сохраняется в общий кэш (core.cache): запись
+уже сбросила поколение области, и отстающие данные реплики легли бы
+под новым поколением на часы, в том числе для самого автора записи.
+'''
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'primary_pin'
+PIN_SECONDS = 10
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+REPLICA_APPS = ('posts',)
+
+_local = threading.local()
+
+
+def primary(view):
+    '''Помечает представление, которое пишет в базу даже на GET.'''
+    view.use_primary = True
+    return view
+
+
+def replicas():
+    return list(getattr(settings, 'REPLICA_DATABASES', []))
+
+
+def use_replica():
+    return getattr(_local, 'use_replica', False)
+
+
+def reading_replica():
+    '''Читает ли текущий запрос с реплики.'''
+    return use_replica() and bool(replicas())
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reading_replica():
+            return random.choice(replicas())
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы.
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.writes = request.method not in SAFE_METHODS
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.use_replica = False
+        if request.writes:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', PIN_SECONDS),
+                httponly=True,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'use_primary', False):
+            request.writes = True
+        _local.use_replica = (
+            not request.writes
+            and PIN_COOKIE not in request.COOKIES
+            and view_func.__module__.split('.')[0] in REPLICA_APPS
+        )
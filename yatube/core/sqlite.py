@@ -0,0 +1,113 @@
+'''Настройка соединений SQLite для конкурентной нагрузки.
+
+В режиме журнала по умолчанию писатель блокирует читателей, а второй
+писатель сразу получает «database is locked». apply_pragmas включает
+для каждого нового соединения PRAGMA из SQLITE_PRAGMAS: журнал WAL
+(читатели не ждут писателя), synchronous=NORMAL, отображение файла в
+память и ожидание блокировки вместо ошибки. benchmark сравнивает
+пропускную способность читателей и писателей с PRAGMA и без них.
+'''
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+# Тайм-аут модуля sqlite3 по умолчанию, с которым Django открывает базу.
+DEFAULT_TIMEOUT = 5
+
+
+def pragmas():
+    return getattr(settings, 'SQLITE_PRAGMAS', PRAGMAS)
+
+
+def execute_pragmas(cursor, values):
+    for name, value in values.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    '''Обработчик connection_created.'''
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            execute_pragmas(cursor, pragmas())
+
+
+def _worker(path, values, operation, stop, results):
+    connection = sqlite3.connect(
+        path, timeout=DEFAULT_TIMEOUT, isolation_level=None
+    )
+    execute_pragmas(connection, values)
+    done = errors = 0
+    while not stop.is_set():
+        try:
+            operation(connection)
+            done += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    connection.close()
+    results.append((operation.__name__, done, errors))
+
+
+def read(connection):
+    connection.execute(
+        'SELECT id, text FROM post ORDER BY id DESC LIMIT 10'
+    ).fetchall()
+
+
+def write(connection):
+    with connection:
+        connection.execute('BEGIN IMMEDIATE')
+        connection.execute(
+            "INSERT INTO post (text) VALUES ('Новый пост')"
+        )
+
+
+def benchmark(values, readers=4, writers=2, seconds=2.0, rows=1000):
+    '''Операции в секунду и ошибки читателей и писателей, которые
+    одновременно работают с временной базой seconds секунд.'''
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.sqlite3')
+        connection = sqlite3.connect(path)
+        execute_pragmas(connection, values)
+        connection.execute(
+            'CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT)'
+        )
+        connection.executemany(
+            'INSERT INTO post (text) VALUES (?)',
+            [(f'Пост {num}',) for num in range(rows)]
+        )
+        connection.commit()
+        connection.close()
+        stop = threading.Event()
+        results = []
+        threads = [
+            threading.Thread(
+                target=_worker,
+                args=(path, values, operation, stop, results)
+            )
+            for operation in [read] * readers + [write] * writers
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    summary = {}
+    for name in ('read', 'write'):
+        done = sum(count for op, count, _ in results if op == name)
+        summary[f'{name}s_per_second'] = round(done / seconds, 1)
+        summary[f'{name}_errors'] = sum(
+            count for op, _, count in results if op == name
+        )
+    return summary
@@ -0,0 +1,226 @@
+'''Фоновая очередь задач в основной базе данных.
+
+Функция, помеченная @task, ставится в очередь вызовом delay(): строка
+Task пишется в текущей транзакции и становится видна воркеру только
+после её коммита. Аргументы сохраняются в JSON.
+
+Воркер (manage.py runworker) забирает готовые задачи, помечая их
+арендой на LEASE_SECONDS. Выполненная задача удаляется, упавшая
+откладывается с экспоненциальной задержкой, после max_attempts
+попыток остаётся со статусом failed. Задача с retry_failed=False после
+этого больше не ставится с теми же аргументами, пока строку не удалят
+(например, в админке). Задача упавшего воркера снова
+становится доступна, когда истекает аренда, поэтому каждая задача
+выполняется хотя бы один раз, но иногда больше — задачи должны быть
+идемпотентными.
+
+С TASKS_EAGER = True задачи выполняются в том же процессе сразу после
+коммита, без воркера.
+'''
+import json
+import logging
+import threading
+import time
+import traceback
+import uuid
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+LEASE_SECONDS = 300
+BACKOFF_SECONDS = 10
+MAX_BACKOFF_SECONDS = 60 * 60
+POLL_INTERVAL = 1.0
+
+REGISTRY = {}
+
+
+def eager():
+    return getattr(settings, 'TASKS_EAGER', False)
+
+
+def backoff(attempts):
+    '''Задержка перед повтором после attempts неудачных попыток.'''
+    return min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+
+
+class TaskFunction:
+    def __init__(self, func, max_attempts, unique, retry_failed):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.max_attempts = max_attempts
+        self.unique = unique
+        self.retry_failed = retry_failed
+        self.__doc__ = func.__doc__
+        REGISTRY[self.name] = self
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        '''Ставит вызов в очередь. Задача с unique=True не ставится,
+        если такой же вызов ещё ждёт воркера, с retry_failed=False — если
+        такой же вызов уже не выполнился.'''
+        arguments = json.dumps([args, kwargs], sort_keys=True)
+        if eager():
+            transaction.on_commit(lambda: _run_eager(self, args, kwargs))
+            return
+        same = Q()
+        if self.unique:
+            same |= Q(status=Task.PENDING, locked_until__isnull=True)
+        if not self.retry_failed:
+            same |= Q(status=Task.FAILED)
+        if same and Task.objects.filter(
+            same, name=self.name, arguments=arguments
+        ).exists():
+            return
+        Task.objects.create(
+            name=self.name,
+            arguments=arguments,
+            max_attempts=self.max_attempts,
+            run_at=timezone.now(),
+        )
+
+
+def task(func=None, *, max_attempts=MAX_ATTEMPTS, unique=False,
+         retry_failed=True):
+    '''Регистрирует функцию как фоновую задачу: @task или
+    @task(max_attempts=3, unique=True). retry_failed=False подходит
+    задачам, которые ставятся при каждом показе страницы: вызов, упавший
+    на битых данных, не будет повторяться при следующем показе.'''
+    if func is None:
+        return lambda func: TaskFunction(
+            func, max_attempts, unique, retry_failed
+        )
+    return TaskFunction(func, max_attempts, unique, retry_failed)
+
+
+def _run_eager(function, args, kwargs):
+    try:
+        function(*args, **kwargs)
+    except Exception:
+        logger.exception('Задача %s не выполнена', function.name)
+
+
+def claim(limit=1, lease=LEASE_SECONDS):
+    '''Арендует до limit готовых задач и возвращает их.
+
+    Свободные задачи сначала только читаются, чтобы простаивающий
+    воркер не брал блокировку записи.'''
+    now = timezone.now()
+    free = Task.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        status=Task.PENDING,
+    )
+    # Воркер упал на последней попытке: повторять задачу больше нельзя.
+    exhausted = free.filter(attempts__gte=F('max_attempts'))
+    if exhausted.exists():
+        exhausted.update(
+            status=Task.FAILED, locked_until=None,
+            error='Воркер не завершил последнюю попытку.'
+        )
+    ready = list(free.filter(
+        run_at__lte=now, attempts__lt=F('max_attempts')
+    ).order_by('run_at', 'pk').values_list('pk', flat=True)[:limit])
+    if not ready:
+        return []
+    owner = uuid.uuid4().hex
+    # Условия повторяются: задачу мог забрать другой воркер.
+    free.filter(pk__in=ready, attempts__lt=F('max_attempts')).update(
+        owner=owner,
+        locked_until=now + timedelta(seconds=lease),
+        attempts=F('attempts') + 1,
+    )
+    return list(Task.objects.filter(owner=owner).order_by('run_at', 'pk'))
+
+
+def task_function(name):
+    '''Зарегистрированная задача; модуль импортируется при первом
+    обращении.'''
+    if name not in REGISTRY:
+        import_module(name.rsplit('.', 1)[0])
+    return REGISTRY[name]
+
+
+def execute(task_row):
+    '''Выполняет арендованную задачу и записывает результат.'''
+    mine = Task.objects.filter(pk=task_row.pk, owner=task_row.owner)
+    try:
+        args, kwargs = json.loads(task_row.arguments)
+        task_function(task_row.name)(*args, **kwargs)
+    except Exception:
+        logger.exception('Задача %s не выполнена', task_row.name)
+        error = traceback.format_exc()
+        if task_row.attempts >= task_row.max_attempts:
+            mine.update(status=Task.FAILED, locked_until=None, error=error)
+        else:
+            mine.update(
+                locked_until=None, error=error,
+                run_at=timezone.now() + timedelta(
+                    seconds=backoff(task_row.attempts)
+                ),
+            )
+        return False
+    mine.delete()
+    return True
+
+
+def run_pending(limit=None):
+    '''Выполняет готовые задачи в текущем потоке, пока они есть.
+
+    Возвращает число выполненных задач.'''
+    done = 0
+    while limit is None or done < limit:
+        rows = claim()
+        if not rows:
+            break
+        execute(rows[0])
+        done += 1
+    return done
+
+
+def _loop(stop, poll_interval):
+    try:
+        while not stop.is_set():
+            # Как между запросами: соединения старше CONN_MAX_AGE и
+            # сломанные закрываются.
+            close_old_connections()
+            try:
+                done = run_pending(limit=1)
+            except Exception:
+                logger.exception('Не удалось получить задачу из очереди')
+                done = 0
+            if not done:
+                stop.wait(poll_interval)
+    finally:
+        connections.close_all()
+
+
+def work(threads=2, stop=None, poll_interval=POLL_INTERVAL):
+    '''Выполняет задачи в threads потоках, пока не установлен stop.'''
+    stop = stop or threading.Event()
+    workers = [
+        threading.Thread(
+            target=_loop, args=(stop, poll_interval),
+            name=f'task-worker-{num}', daemon=True,
+        )
+        for num in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        while any(worker.is_alive() for worker in workers):
+            time.sleep(poll_interval)
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,44 @@
+from django import template
+
+from core import cache
+
+register = template.Library()
+
+
+@register.filter
+def scope(name, value):
+    return cache.scope(name, value)
+
+
+class VersionedCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, scopes):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.scopes = scopes
+
+    def render(self, context):
+        key = cache.make_key(
+            f'fragment:{self.fragment_name}',
+            [name.resolve(context) for name in self.scopes]
+        )
+        return cache.get_or_set(key, lambda: self.nodelist.render(context))
+
+
+@register.tag('versioned_cache')
+def do_versioned_cache(parser, token):
+    '''Кэширует фрагмент шаблона до сброса перечисленных областей.
+
+    {% versioned_cache post_card 'post'|scope:post.pk %}
+        ...
+    {% endversioned_cache %}
+    '''
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f'Тег {bits[0]} принимает имя фрагмента и хотя бы одну область.'
+        )
+    nodelist = parser.parse(('endversioned_cache',))
+    parser.delete_first_token()
+    return VersionedCacheNode(
+        nodelist, bits[1], [parser.compile_filter(bit) for bit in bits[2:]]
+    )
@@ -0,0 +1,493 @@
+import os
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache as django_cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import cache, sqlite, tasks
+from core.cache_backend import SQLiteCache
+from core.metrics import registry
+from core.models import Task
+from core.replicas import PIN_COOKIE, ReplicaRouter
+from posts.models import Post
+
+CALLS = []
+
+
+@tasks.task
+def record(value, suffix=''):
+    CALLS.append(value + suffix)
+
+
+@tasks.task(max_attempts=2, unique=True)
+def explode(value):
+    raise ValueError(value)
+
+
+@tasks.task(max_attempts=1, unique=True, retry_failed=False)
+def explode_once(value):
+    raise ValueError(value)
+
+
+class VersionedCacheTest(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        cache.clear_stats()
+
+    def test_bump_changes_key(self):
+        """Сброс области меняет ключи всех зависящих от неё значений."""
+        key = cache.make_key('value', ['feed', 'post:1'])
+        self.assertEqual(key, cache.make_key('value', ['feed', 'post:1']))
+        cache.bump('post:1')
+        self.assertNotEqual(
+            key, cache.make_key('value', ['feed', 'post:1'])
+        )
+        self.assertEqual(
+            cache.make_key('value', ['feed']),
+            cache.make_key('value', ['feed'])
+        )
+
+    def test_evicted_version_not_reused(self):
+        """Вытесненное поколение не совпадает с прежним."""
+        key = cache.make_key('value', ['feed'])
+        django_cache.delete('version:feed')
+        self.assertNotEqual(key, cache.make_key('value', ['feed']))
+
+    def test_stats(self):
+        """Попадания, промахи и сбросы считаются."""
+        cache.get_or_set('key', lambda: 'value')
+        cache.get_or_set('key', lambda: 'value')
+        cache.bump('feed', 'post:1')
+        self.assertEqual(
+            cache.stats(), {'hits': 1, 'misses': 1, 'invalidations': 2}
+        )
+
+    def test_stats_not_written_to_cache(self):
+        """Чтение из кэша не пишет в него счётчики."""
+        cache.set('key', 'value')
+        with mock.patch.object(django_cache, 'incr') as incr, \
+                mock.patch.object(django_cache, 'add') as add:
+            cache.get('key')
+            cache.get('missing')
+        incr.assert_not_called()
+        add.assert_not_called()
+
+    def test_get_or_compute(self):
+        """Значение считается один раз и отдаётся из кэша."""
+        producer = mock.Mock(return_value='value')
+        self.assertEqual(cache.get_or_compute('key', producer), 'value')
+        self.assertEqual(cache.get_or_compute('key', producer), 'value')
+        producer.assert_called_once()
+
+    def test_stale_value_served_during_refresh(self):
+        """Пока другой процесс пересчитывает значение, отдаётся
+        устаревшее."""
+        django_cache.set('key', ('stale', 0, 0))
+        django_cache.add('lock:key', 1)
+        producer = mock.Mock(return_value='fresh')
+        self.assertEqual(cache.get_or_compute('key', producer), 'stale')
+        producer.assert_not_called()
+
+    def test_miss_waits_for_other_worker(self):
+        """При промахе во время чужого пересчёта результат ждут, а не
+        считают заново."""
+        django_cache.add('lock:key', 1)
+        producer = mock.Mock(return_value='own')
+
+        def other_worker_finishes(seconds):
+            django_cache.set('key', ('computed', 2 ** 40, 0))
+
+        with mock.patch(
+            'core.cache.time.sleep', side_effect=other_worker_finishes
+        ):
+            value = cache.get_or_compute('key', producer)
+        self.assertEqual(value, 'computed')
+        producer.assert_not_called()
+
+    def test_early_refresh(self):
+        """Долгий расчёт пересчитывается заранее, до истечения срока."""
+        django_cache.set('key', ('old', time.time() + 1, 10))
+        self.assertEqual(
+            cache.get_or_compute('key', lambda: 'new', beta=0), 'old'
+        )
+        with mock.patch('core.cache.random.random', return_value=0.99):
+            self.assertEqual(cache.get_or_compute('key', lambda: 'new'), 'new')
+
+    def test_versioned_cache_tag(self):
+        """Фрагмент шаблона кэшируется до сброса области."""
+        template = Template(
+            '{% load versioned_cache %}'
+            "{% versioned_cache card 'post'|scope:pk %}{{ text }}"
+            '{% endversioned_cache %}'
+        )
+        self.assertEqual(template.render(Context({'pk': 1, 'text': 'a'})), 'a')
+        self.assertEqual(template.render(Context({'pk': 1, 'text': 'b'})), 'a')
+        cache.bump(cache.scope('post', 1))
+        self.assertEqual(template.render(Context({'pk': 1, 'text': 'b'})), 'b')
+
+
+@override_settings(PROFILER_SAMPLE_RATE=1, PROFILER_LOG_INTERVAL=0)
+class ProfilerMiddlewareTest(TestCase):
+    def setUp(self):
+        registry.clear()
+        django_cache.clear()
+
+    def test_sampled_request_recorded(self):
+        """Замеры профилируемого запроса попадают в гистограммы."""
+        with self.assertLogs('core.profiler', 'INFO'):
+            self.client.get(reverse('posts:index'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('# TYPE yatube_sql_queries histogram', body)
+        self.assertIn(
+            'yatube_request_seconds_count{view="posts:index"} 1', body
+        )
+        self.assertIn('yatube_sql_queries_count{view="posts:index"} 1', body)
+        self.assertIn(
+            'yatube_sql_queries_bucket{view="posts:index",le="+Inf"} 1', body
+        )
+        self.assertIn(
+            'yatube_template_seconds_count{view="posts:index"} 1', body
+        )
+        self.assertIn('# TYPE yatube_cache_events_total counter', body)
+        self.assertIn('yatube_cache_events_total{event="misses"}', body)
+
+    @override_settings(PROFILER_SAMPLE_RATE=0)
+    def test_unsampled_request_not_recorded(self):
+        """Без выборки запросы не замеряются."""
+        self.client.get(reverse('posts:index'))
+        self.assertNotIn('posts:index', registry.render())
+
+    def test_metrics_hidden_from_outside(self):
+        """Страница метрик недоступна вне INTERNAL_IPS."""
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='10.0.0.1'
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.user = get_user_model().objects.create(username='user')
+        self.client.force_login(self.user)
+        # Реплика подменяется основной базой: проверяется только выбор.
+        patcher = mock.patch(
+            'core.replicas.random.choice', return_value='default'
+        )
+        self.choice = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_outside_requests_use_primary(self):
+        """Вне запросов к лентам чтение идёт в основную базу."""
+        self.assertEqual(ReplicaRouter().db_for_read(None), 'default')
+        self.choice.assert_not_called()
+
+    def test_feed_reads_use_replica(self):
+        """Ленты читаются с реплики."""
+        self.client.get(reverse('posts:index'))
+        self.choice.assert_called_with(['replica'])
+
+    def test_writes_pin_user_to_primary(self):
+        """Запись и следующие за ней запросы идут в основную базу."""
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.client.get(reverse('posts:index'))
+        self.choice.assert_not_called()
+        del self.client.cookies[PIN_COOKIE]
+        self.client.get(reverse('posts:index'))
+        self.choice.assert_called_with(['replica'])
+
+    def test_writing_get_views_use_primary(self):
+        """Подписка по GET тоже считается записью."""
+        author = get_user_model().objects.create(username='author')
+        response = self.client.get(
+            reverse('posts:profile_follow', args=[author.username])
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.choice.assert_not_called()
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaDatabaseTest(TestCase):
+    '''Реплика — отдельный файл SQLite со своими данными.'''
+
+    @classmethod
+    def setUpClass(cls):
+        # Копия схемы снимается до транзакции теста: резервное
+        # копирование ждёт, пока в базе открыта запись.
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, 'replica.sqlite3')
+        connection.ensure_connection()
+        target = sqlite3.connect(cls.path)
+        connection.connection.backup(target)
+        now = timezone.now().isoformat(' ')
+        with target:
+            target.execute(
+                'INSERT INTO auth_user (id, password, is_superuser, '
+                'username, first_name, last_name, email, is_staff, '
+                'is_active, date_joined) '
+                "VALUES (1, '', 0, 'author', '', '', '', 0, 1, ?)", [now]
+            )
+            target.execute(
+                'INSERT INTO posts_post (text, author_id, image, '
+                'image_variants, created, updated, comments_count) '
+                "VALUES ('Пост на реплике', 1, '', '', ?, ?, 0)", [now, now]
+            )
+        target.close()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.directory.cleanup()
+
+    def setUp(self):
+        django_cache.clear()
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': self.path,
+        }
+        self.addCleanup(self.remove_replica)
+        author = get_user_model().objects.create(username='author')
+        Post.objects.create(author=author, text='Пост в основной базе')
+
+    def remove_replica(self):
+        connections['replica'].close()
+        del connections.databases['replica']
+        delattr(connections._connections, 'replica')
+
+    def test_feed_read_from_replica(self):
+        """Лента читается из файла реплики, а не из основной базы."""
+        content = self.client.get(reverse('posts:index')).content.decode()
+        self.assertIn('Пост на реплике', content)
+        self.assertNotIn('Пост в основной базе', content)
+
+    def test_replica_reads_not_cached(self):
+        """Страница, прочитанная с реплики, не попадает в кэш и не видна
+        пользователю, читающему из основной базы."""
+        self.client.get(reverse('posts:index'))
+        self.client.cookies[PIN_COOKIE] = '1'
+        content = self.client.get(reverse('posts:index')).content.decode()
+        self.assertIn('Пост в основной базе', content)
+        self.assertNotIn('Пост на реплике', content)
+
+
+class SqliteTuningTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Новое соединение получает PRAGMA из SQLITE_PRAGMAS."""
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        # 1 — synchronous=NORMAL.
+        self.assertEqual(self.pragma('synchronous'), 1)
+
+    def test_benchmark(self):
+        """Бенчмарк считает операции читателей и писателей."""
+        summary = sqlite.benchmark(
+            sqlite.PRAGMAS, readers=1, writers=1, seconds=0.1, rows=10
+        )
+        self.assertGreater(summary['reads_per_second'], 0)
+        self.assertGreater(summary['writes_per_second'], 0)
+        self.assertEqual(summary['write_errors'], 0)
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = self.backend()
+
+    def backend(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_shared_between_processes(self):
+        """Значение, записанное одним воркером, видно другому."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.backend().get('key'), {'value': 1})
+        self.assertTrue(self.backend().has_key('key'))
+
+    def test_add_incr_delete(self):
+        """add, incr и delete ведут себя как у встроенных бэкендов."""
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.incr('key', 2), 3)
+        self.assertEqual(self.cache.get_many(['key', 'missing']), {'key': 3})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('key')
+
+    def test_expired_value_not_returned(self):
+        self.cache.set('key', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.cache.set('forever', 'value', timeout=None)
+        self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_least_recently_used_evicted(self):
+        """При превышении числа записей вытесняются давно не
+        читавшиеся."""
+        cache = self.backend(MAX_ENTRIES=3, CULL_FREQUENCY=4)
+        for num in range(3):
+            with mock.patch('time.time', return_value=num):
+                cache.set(f'key{num}', num, timeout=None)
+        with mock.patch('time.time', return_value=10):
+            cache.get('key0')
+            cache.set('key3', 3, timeout=None)
+        self.assertEqual(
+            cache.get_many([f'key{num}' for num in range(4)]),
+            {'key0': 0, 'key2': 2, 'key3': 3}
+        )
+
+    def test_size_bounded(self):
+        """Суммарный размер значений не превышает MAX_SIZE."""
+        cache = self.backend(MAX_SIZE=10000)
+        for num in range(20):
+            cache.set(f'key{num}', 'x' * 1000)
+        found = cache.get_many([f'key{num}' for num in range(20)])
+        self.assertLessEqual(len(found), 10)
+        self.assertIn('key19', found)
+
+    def test_totals_kept_without_scan(self):
+        """Число и размер записей ведут триггеры, в том числе при
+        перезаписи и удалении."""
+        self.cache.set('a', 'x' * 100)
+        self.cache.set('b', 'y')
+        self.cache.set('a', 'z')
+        self.cache.delete('b')
+        connection = self.cache._connection()
+        self.assertEqual(
+            self.cache._totals(connection),
+            connection.execute(
+                'SELECT count(*), sum(size) FROM cache'
+            ).fetchone()
+        )
+        self.cache.set('n', 1)
+        self.cache.incr('n', 10 ** 30)
+        self.assertEqual(
+            self.cache._totals(connection),
+            connection.execute(
+                'SELECT count(*), sum(length(value)) FROM cache'
+            ).fetchone()
+        )
+        self.cache.clear()
+        self.assertEqual(self.cache._totals(connection), (0, 0))
+
+    def test_read_does_not_wait_for_writer(self):
+        """Чтение не ждёт чужой записи, чтобы обновить время чтения."""
+        with mock.patch('time.time', return_value=0):
+            self.cache.set('key', 'value', timeout=None)
+        writer = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(writer.close)
+        writer.execute('BEGIN IMMEDIATE')
+        started = time.monotonic()
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertLess(time.monotonic() - started, 1)
+        writer.execute('ROLLBACK')
+
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_delay_stores_call(self):
+        """delay() сохраняет вызов, runworker --once его выполняет."""
+        record.delay('a', suffix='!')
+        task = Task.objects.get()
+        self.assertEqual(task.name, 'core.tests.record')
+        self.assertEqual(CALLS, [])
+        call_command('runworker', once=True, stdout=mock.MagicMock())
+        self.assertEqual(CALLS, ['a!'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_unique_task_not_duplicated(self):
+        """Такой же ожидающий вызов unique-задачи не ставится повторно."""
+        explode.delay('x')
+        explode.delay('x')
+        explode.delay('y')
+        record.delay('a')
+        record.delay('a')
+        self.assertEqual(Task.objects.filter(name=explode.name).count(), 2)
+        self.assertEqual(Task.objects.filter(name=record.name).count(), 2)
+
+    def test_failed_task_retried_with_backoff(self):
+        """Упавшая задача откладывается, после max_attempts — failed."""
+        explode.delay('boom')
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertEqual(tasks.run_pending(), 1)
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertEqual(task.attempts, 1)
+        self.assertIn('ValueError: boom', task.error)
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertEqual(tasks.run_pending(), 0)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_pending()
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+        self.assertEqual(tasks.run_pending(), 0)
+
+    def test_failed_task_not_queued_again(self):
+        """Вызов с retry_failed=False не ставится снова после failed."""
+        explode_once.delay('broken')
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_pending()
+        explode_once.delay('broken')
+        explode_once.delay('other')
+        explode.delay('boom')
+        Task.objects.filter(name=explode.name).update(status=Task.FAILED)
+        explode.delay('boom')
+        self.assertEqual(
+            list(Task.objects.order_by('pk').values_list(
+                'arguments', 'status'
+            )),
+            [
+                ('[["broken"], {}]', Task.FAILED),
+                ('[["other"], {}]', Task.PENDING),
+                ('[["boom"], {}]', Task.FAILED),
+                ('[["boom"], {}]', Task.PENDING),
+            ]
+        )
+
+    def test_backoff_grows(self):
+        self.assertEqual(
+            [tasks.backoff(attempt) for attempt in (1, 2, 3)],
+            [tasks.BACKOFF_SECONDS * factor for factor in (1, 2, 4)]
+        )
+        self.assertEqual(tasks.backoff(100), tasks.MAX_BACKOFF_SECONDS)
+
+    def test_expired_lease_claimed_again(self):
+        """Задачу упавшего воркера забирают после истечения аренды."""
+        record.delay('a')
+        self.assertEqual(len(tasks.claim()), 1)
+        self.assertEqual(tasks.claim(), [])
+        Task.objects.update(locked_until=timezone.now())
+        [task] = tasks.claim()
+        self.assertEqual(task.attempts, 2)
+        tasks.execute(task)
+        self.assertEqual(CALLS, ['a'])
+
+    def test_exhausted_lease_marked_failed(self):
+        explode.delay('x')
+        for _ in range(explode.max_attempts):
+            tasks.claim()
+            Task.objects.update(locked_until=timezone.now())
+        self.assertEqual(tasks.claim(), [])
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
@@ -1,5 +1,10 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from . import cache
+from .metrics import registry, render_counters
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +20,15 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def metrics(request):
+    '''Гистограммы профилировщика и счётчики кэша процесса для
+    Prometheus, только для INTERNAL_IPS.'''
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+        raise Http404
+    body = registry.render() + render_counters(
+        'cache_events', 'Попадания, промахи и сбросы кэша.', 'event',
+        cache.stats()
+    )
+    return HttpResponse(body, content_type='text/plain; version=0.0.4')
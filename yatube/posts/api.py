@@ -0,0 +1,277 @@
+'''JSON-версии лент для мобильных клиентов.
+
+Посты выбираются через values(), без создания экземпляров моделей, и
+листаются курсором (?cursor=) так же, как HTML-ленты; комментарии
+поста отдаются с ветками ответов (posts.threads). Готовый ответ
+кэшируется до сброса областей кэша ленты и постов на странице, поэтому
+повторный запрос с If-None-Match или If-Modified-Since получает 304
+без выборки постов. Общая лента, пост и лента подписок отвечают, не
+обращаясь к базе; группа и профиль делают один запрос, чтобы найти
+группу или автора по адресу. Лента подписок помечена как личная
+(Cache-Control: private, Vary: Cookie).
+'''
+import hashlib
+import json
+from calendar import timegm
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from core import cache
+from core.cache import scope
+
+from .models import Comment, Group, Post, TimelineEntry, User
+from .paginators import CURSOR_PARAM, PAGE_PARAM, CursorPaginator
+from .threads import load_replies
+from .timeline import TimelinePaginator, hybrid_authors
+from .views import COMMENTS_AMOUNT, POSTS_AMOUNT
+
+POST_FIELDS = (
+    'id', 'text', 'created', 'updated', 'image', 'comments_count',
+    'author__username', 'group__slug',
+)
+COMMENT_FIELDS = (
+    'id', 'text', 'created', 'post_id', 'parent_id', 'path', 'depth',
+    'author__username',
+)
+
+
+class ValuesPaginatorMixin:
+    '''Курсор по строкам values() вместо экземпляров моделей.'''
+
+    def _key(self, row):
+        return row['created'], row['id']
+
+
+class ValuesCursorPaginator(ValuesPaginatorMixin, CursorPaginator):
+    pass
+
+
+class ValuesTimelinePaginator(ValuesPaginatorMixin, TimelinePaginator):
+    def _entry_post(self, entry):
+        return {field: entry[f'post__{field}'] for field in POST_FIELDS}
+
+
+def post_json(row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': default_storage.url(row['image']) if row['image'] else None,
+        'comments_count': row['comments_count'],
+        'created': row['created'],
+        'updated': row['updated'],
+    }
+
+
+def comment_json(comment):
+    '''Комментарий с ответами до THREAD_DEPTH уровней в порядке вывода.
+
+    Ответ ссылается на родителя через parent; has_hidden_replies
+    отмечает ответы, под которыми есть более глубокие.
+    '''
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'author': comment.author.username,
+        'created': comment.created,
+        'replies': [
+            {
+                'id': reply.pk,
+                'parent': reply.parent_id,
+                'depth': reply.depth,
+                'text': reply.text,
+                'author': reply.author.username,
+                'created': reply.created,
+                'has_hidden_replies': reply.has_hidden_replies,
+            }
+            for reply in comment.shown_replies
+        ],
+    }
+
+
+def page_json(page, serialize):
+    return {
+        'results': [serialize(row) for row in page.object_list],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+def get_page(request, paginator):
+    return paginator.get_cursor_page(
+        request.GET.get(CURSOR_PARAM), request.GET.get(PAGE_PARAM)
+    )
+
+
+def feed_content(page):
+    '''Данные страницы постов, их id и время последнего изменения.'''
+    rows = page.object_list
+    last_modified = max(
+        (max(row['created'], row['updated']) for row in rows), default=None
+    )
+    return page_json(page, post_json), [row['id'] for row in rows], (
+        last_modified
+    )
+
+
+def conditional_json(request, scopes, build):
+    '''Ответ с ETag и Last-Modified, кэшируемый до сброса scopes.
+
+    build возвращает данные, id показанных постов и время последнего
+    изменения. Правка поста сбрасывает только его собственную область,
+    поэтому версии областей постов хранятся рядом с ответом и
+    сверяются при чтении.
+    '''
+    key = cache.make_key('api', scopes, request.get_full_path())
+    cached = cache.get(key)
+    if cached is not None:
+        body, etag, last_modified, post_scopes, post_versions = cached
+        if cache.versions(post_scopes) != post_versions:
+            cached = None
+    if cached is None:
+        data, post_ids, modified = build()
+        body = json.dumps(
+            data, cls=DjangoJSONEncoder, ensure_ascii=False
+        ).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        last_modified = modified and timegm(modified.utctimetuple())
+        post_scopes = [scope('post', pk) for pk in post_ids]
+        cache.set(key, (
+            body, etag, last_modified, post_scopes,
+            cache.versions(post_scopes),
+        ))
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=response
+    )
+
+
+@require_safe
+def index(request):
+    def build():
+        posts = Post.objects.values(*POST_FIELDS)
+        page = get_page(request, ValuesCursorPaginator(posts, POSTS_AMOUNT))
+        return feed_content(page)
+
+    return conditional_json(request, ['feed'], build)
+
+
+@require_safe
+def group_posts(request, slug):
+    group = get_object_or_404(
+        Group.objects.values('id', 'title', 'slug', 'description'),
+        slug=slug
+    )
+
+    def build():
+        posts = Post.objects.filter(group_id=group['id']).values(
+            *POST_FIELDS
+        )
+        page = get_page(request, ValuesCursorPaginator(posts, POSTS_AMOUNT))
+        data, post_ids, last_modified = feed_content(page)
+        data['group'] = group
+        return data, post_ids, last_modified
+
+    return conditional_json(request, [scope('group', group['id'])], build)
+
+
+@require_safe
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.values(
+            'id', 'username', 'first_name', 'last_name',
+            'stats__posts_count', 'stats__followers_count',
+            'stats__following_count',
+        ),
+        username=username
+    )
+
+    def build():
+        posts = Post.objects.filter(author_id=author['id']).values(
+            *POST_FIELDS
+        )
+        page = get_page(request, ValuesCursorPaginator(posts, POSTS_AMOUNT))
+        data, post_ids, last_modified = feed_content(page)
+        data['author'] = {
+            'username': author['username'],
+            'first_name': author['first_name'],
+            'last_name': author['last_name'],
+            'posts_count': author['stats__posts_count'] or 0,
+            'followers_count': author['stats__followers_count'] or 0,
+            'following_count': author['stats__following_count'] or 0,
+        }
+        return data, post_ids, last_modified
+
+    return conditional_json(request, [scope('author', author['id'])], build)
+
+
+@require_safe
+def post_detail(request, post_id):
+    def build():
+        post = Post.objects.filter(pk=post_id).values(*POST_FIELDS).first()
+        if post is None:
+            raise Http404
+        comments = Comment.objects.filter(
+            post_id=post_id, depth=0
+        ).select_related('author').only(*COMMENT_FIELDS)
+        page = get_page(request, CursorPaginator(comments, COMMENTS_AMOUNT))
+        load_replies(page.object_list)
+        last_modified = max(
+            (
+                reply.created for comment in page.object_list
+                for reply in [comment, *comment.shown_replies]
+            ),
+            default=post['updated']
+        )
+        data = {
+            'post': post_json(post),
+            'comments': page_json(page, comment_json),
+        }
+        return data, [], max(last_modified, post['updated'])
+
+    return conditional_json(request, [scope('post', post_id)], build)
+
+
+@require_safe
+def follow_index(request):
+    user = request.user
+    if not user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Требуется авторизация.'}, status=401
+        )
+
+    def build():
+        entries = TimelineEntry.objects.filter(user=user).values(
+            'created', 'post_id',
+            *(f'post__{field}' for field in POST_FIELDS)
+        )
+        authors = hybrid_authors(user)
+        hybrid_posts = None
+        if authors:
+            hybrid_posts = Post.objects.filter(
+                author_id__in=authors
+            ).values(*POST_FIELDS)
+        page = get_page(request, ValuesTimelinePaginator(
+            entries, POSTS_AMOUNT, hybrid_posts=hybrid_posts
+        ))
+        return feed_content(page)
+
+    response = conditional_json(
+        request, ['feed', scope('timeline', user.pk)], build
+    )
+    # Лента своя у каждого пользователя: общие кэши её не хранят.
+    patch_vary_headers(response, ['Cookie'])
+    patch_cache_control(response, private=True)
+    return response
@@ -0,0 +1,311 @@
+'''Нагрузочный бенчмарк публичных страниц.
+
+Данные генерируются mixer и Faker с фиксированным зерном, поэтому
+прогоны на разных коммитах идут по одинаковому набору. Каждая страница
+запрашивается через тестовый клиент Django (время самого Django) и
+через настоящий WSGI-сервер (с разбором HTTP), отчёт сохраняется в JSON
+и сравнивается с отчётом другого коммита командой benchmark --compare.
+'''
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.wsgi import get_wsgi_application
+from django.db import transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from mixer.backend.django import Mixer
+
+from .models import Comment, Follow, Group, Post, User
+
+DATASET = {
+    'users': 100,
+    'groups': 10,
+    'posts': 1000,
+    'follows': 500,
+    'comments': 2000,
+}
+PERCENTILES = (50, 95, 99)
+SUCCESS_STATUSES = range(200, 400)
+BENCHMARK_USERNAME = 'benchmark'
+
+# Бэкенды, у которых LOCATION — путь в файловой системе.
+FILE_CACHE_BACKENDS = (
+    'core.cache_backend.SQLiteCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+)
+
+Scenario = namedtuple('Scenario', 'name method url data auth')
+
+
+def seed(seed=0, **sizes):
+    '''Наполняет базу синтетическими данными и возвращает их размеры.
+
+    Объекты сохраняются по одному, чтобы отработали сигналы: счётчики,
+    ленты подписок и поисковый индекс строятся как в жизни.
+    '''
+    sizes = {**DATASET, **sizes}
+    rng = random.Random(seed)
+    mixer = Mixer(locale='ru_RU')
+    mixer.faker.seed_instance(seed)
+    with transaction.atomic():
+        users = [
+            mixer.blend(User, username=f'user{num}')
+            for num in range(sizes['users'])
+        ]
+        users.append(mixer.blend(User, username=BENCHMARK_USERNAME))
+        groups = [
+            mixer.blend(Group, slug=f'group-{num}')
+            for num in range(sizes['groups'])
+        ]
+        posts = [
+            mixer.blend(
+                Post,
+                author=rng.choice(users),
+                group=rng.choice(groups + [None]),
+                text=mixer.faker.text(),
+                image='',
+                image_variants='',
+                comments_count=0,
+            )
+            for _ in range(sizes['posts'])
+        ]
+        pairs = set()
+        while len(pairs) < sizes['follows']:
+            user, author = rng.sample(users, 2)
+            pairs.add((user.pk, author.pk))
+        for user_id, author_id in sorted(pairs):
+            Follow.objects.create(user_id=user_id, author_id=author_id)
+        for _ in range(sizes['comments']):
+            Comment.objects.create(
+                post=rng.choice(posts),
+                author=rng.choice(users),
+                text=mixer.faker.sentence(),
+            )
+    return sizes
+
+
+def scenarios():
+    '''Сценарии бенчмарка: самые тяжёлые страницы набора данных.'''
+    user = User.objects.get(username=BENCHMARK_USERNAME)
+    author = User.objects.annotate(
+        total=Count('posts')
+    ).order_by('-total', 'pk').first()
+    group = Group.objects.annotate(
+        total=Count('posts')
+    ).order_by('-total', 'pk').first()
+    post = Post.objects.order_by('-comments_count', 'pk').first()
+    own_post, _ = Post.objects.get_or_create(author=user, text='Свой пост')
+    return [
+        Scenario('index', 'get', reverse('posts:index'), None, False),
+        Scenario(
+            'group_posts', 'get',
+            reverse('posts:group_list', args=[group.slug]), None, False
+        ),
+        Scenario(
+            'profile', 'get',
+            reverse('posts:profile', args=[author.username]), None, False
+        ),
+        Scenario(
+            'post_detail', 'get',
+            reverse('posts:post_detail', args=[post.pk]), None, False
+        ),
+        Scenario(
+            'follow_index', 'get', reverse('posts:follow_index'), None, True
+        ),
+        Scenario(
+            'post_create', 'post', reverse('posts:post_create'),
+            {'text': 'Новый пост'}, True
+        ),
+        Scenario(
+            'post_edit', 'post',
+            reverse('posts:post_edit', args=[own_post.pk]),
+            {'text': 'Изменённый пост'}, True
+        ),
+        Scenario(
+            'add_comment', 'post',
+            reverse('posts:add_comment', args=[post.pk]),
+            {'text': 'Комментарий'}, True
+        ),
+        Scenario(
+            'profile_follow', 'get',
+            reverse('posts:profile_follow', args=[author.username]),
+            None, True
+        ),
+        Scenario(
+            'profile_unfollow', 'get',
+            reverse('posts:profile_unfollow', args=[author.username]),
+            None, True
+        ),
+    ]
+
+
+def percentile(ordered, rank):
+    '''Перцентиль rank по методу ближайшего ранга.'''
+    index = max(math.ceil(rank / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def summarize(latencies, errors, elapsed):
+    '''Пропускная способность и перцентили задержки в миллисекундах.'''
+    ordered = sorted(latencies)
+    summary = {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': round(len(ordered) / elapsed, 1) if elapsed else 0,
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+    for rank in PERCENTILES:
+        summary[f'p{rank}_ms'] = round(percentile(ordered, rank) * 1000, 3)
+    return summary
+
+
+def measure(send, scenario, requests_count, warmup):
+    '''Выполняет сценарий warmup + requests_count раз подряд.'''
+    for _ in range(warmup):
+        send(scenario)
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(requests_count):
+        start = time.perf_counter()
+        status = send(scenario)
+        latencies.append(time.perf_counter() - start)
+        if status not in SUCCESS_STATUSES:
+            errors += 1
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def client_sender():
+    '''Отправка запросов через тестовый клиент Django.'''
+    guest = Client()
+    member = Client()
+    member.force_login(User.objects.get(username=BENCHMARK_USERNAME))
+
+    def send(scenario):
+        client = member if scenario.auth else guest
+        method = getattr(client, scenario.method)
+        return method(scenario.url, scenario.data or {}).status_code
+
+    return send
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def wsgi_server():
+    '''Поднимает WSGI-сервер проекта в фоновом потоке.'''
+    server = make_server(
+        '127.0.0.1', 0, get_wsgi_application(), handler_class=QuietHandler
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def http_sender(base_url):
+    '''Отправка запросов по HTTP с сессией и CSRF-токеном.'''
+    client = Client()
+    client.force_login(User.objects.get(username=BENCHMARK_USERNAME))
+    guest = requests.Session()
+    member = requests.Session()
+    member.cookies.set(
+        settings.SESSION_COOKIE_NAME,
+        client.cookies[settings.SESSION_COOKIE_NAME].value
+    )
+    member.get(base_url + reverse('posts:post_create'))
+    member.headers['X-CSRFToken'] = member.cookies.get(
+        settings.CSRF_COOKIE_NAME, ''
+    )
+
+    def send(scenario):
+        session = member if scenario.auth else guest
+        return session.request(
+            scenario.method, base_url + scenario.url,
+            data=scenario.data, allow_redirects=False
+        ).status_code
+
+    return send
+
+
+def run_scenarios(send, requests_count, warmup):
+    results = {}
+    for scenario in scenarios():
+        cache.clear()
+        results[scenario.name] = measure(
+            send, scenario, requests_count, warmup
+        )
+    return results
+
+
+@contextmanager
+def isolated_cache():
+    '''Кэш во временном каталоге, чтобы замер не сбрасывал и не засорял
+    кэш работающего сервера. Файловый бэкенд сохраняется, остальные
+    заменяются кэшем в памяти.'''
+    default = settings.CACHES['default']
+    with tempfile.TemporaryDirectory() as directory:
+        if default['BACKEND'] in FILE_CACHE_BACKENDS:
+            default = {
+                **default, 'LOCATION': os.path.join(directory, 'cache')
+            }
+        else:
+            default = {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'benchmark',
+            }
+        with override_settings(CACHES={**settings.CACHES, 'default': default}):
+            yield
+
+
+def run(modes=('client', 'wsgi'), requests_count=100, warmup=10):
+    '''Прогоняет все сценарии в каждом режиме и возвращает результаты.'''
+    with isolated_cache():
+        return _run(modes, requests_count, warmup)
+
+
+def _run(modes, requests_count, warmup):
+    results = {}
+    if 'client' in modes:
+        results['client'] = run_scenarios(
+            client_sender(), requests_count, warmup
+        )
+    if 'wsgi' in modes:
+        with wsgi_server() as base_url:
+            results['wsgi'] = run_scenarios(
+                http_sender(base_url), requests_count, warmup
+            )
+    return results
+
+
+def compare(old, new, metric='p95_ms'):
+    '''Изменение metric в процентах для сценариев обоих отчётов.'''
+    changes = {}
+    for mode, scenarios_results in new['results'].items():
+        for name, summary in scenarios_results.items():
+            before = old['results'].get(mode, {}).get(name, {}).get(metric)
+            if before:
+                changes[(mode, name)] = (
+                    before,
+                    summary[metric],
+                    round((summary[metric] - before) / before * 100, 1),
+                )
+    return changes
@@ -0,0 +1,301 @@
+'''Потоковый импорт и экспорт контента в NDJSON и CSV.
+
+Каждая модель лежит в своём файле (groups.ndjson, posts.csv и т. д.).
+Файлы читаются и пишутся построчно, строки сохраняются пачками через
+bulk_create, каждая пачка в своей транзакции, поэтому память не
+зависит от размера файла. После каждой пачки число обработанных строк
+записывается в файл контрольной точки, и прерванный импорт
+продолжается с того же места.
+
+bulk_create не отправляет сигналы, поэтому производные данные
+(счётчики, ленты подписок, поисковый индекс, пути комментариев)
+обновляются здесь же для каждой пачки. Авторы и подписчики хранятся по
+username; недостающие пользователи создаются без пароля.
+'''
+import csv
+import json
+import os
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from core import cache
+from core.cache import scope
+
+from . import search, timeline
+from .counters import reconcile_authors, reconcile_posts, shift_authors
+from .models import Comment, Follow, Group, Post, User, path_segment
+
+FORMATS = ('ndjson', 'csv')
+BATCH_SIZE = 2000
+CHECKPOINT = '.import-checkpoint.json'
+# Порядок важен: при импорте ссылки должны указывать на уже
+# загруженные строки.
+FIELDS = {
+    'groups': ('id', 'title', 'slug', 'description'),
+    'posts': (
+        'id', 'text', 'author', 'group_id', 'image', 'created', 'updated'
+    ),
+    'comments': ('id', 'post_id', 'parent_id', 'author', 'text', 'created'),
+    'follows': ('user', 'author'),
+}
+
+
+def _optional_int(value):
+    return int(value) if value not in (None, '') else None
+
+
+CONVERTERS = {
+    'id': int,
+    'post_id': int,
+    'group_id': _optional_int,
+    'parent_id': _optional_int,
+    'created': parse_datetime,
+    'updated': parse_datetime,
+}
+
+
+def _rows(name):
+    '''Строки модели name в порядке FIELDS, без загрузки в память.'''
+    querysets = {
+        'groups': Group.objects.order_by('pk'),
+        'posts': Post.objects.order_by('pk'),
+        # По пути: родительский комментарий всегда идёт раньше ответа.
+        'comments': Comment.objects.order_by('path'),
+        'follows': Follow.objects.order_by('pk'),
+    }
+    columns = [
+        f'{field}__username' if field in ('author', 'user') else field
+        for field in FIELDS[name]
+    ]
+    return querysets[name].values_list(*columns).iterator(
+        chunk_size=BATCH_SIZE
+    )
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def filename(name, file_format):
+    return f'{name}.{file_format}'
+
+
+def export(name, file, file_format):
+    '''Записывает строки модели name в файл и возвращает их число.'''
+    fields = FIELDS[name]
+    count = 0
+    if file_format == 'csv':
+        writer = csv.writer(file)
+        writer.writerow(fields)
+    for row in _rows(name):
+        row = [_plain(value) for value in row]
+        if file_format == 'csv':
+            writer.writerow(['' if value is None else value for value in row])
+        else:
+            file.write(
+                json.dumps(dict(zip(fields, row)), ensure_ascii=False) + '\n'
+            )
+        count += 1
+    return count
+
+
+def read(file, file_format):
+    '''Строки файла в виде словарей с приведёнными типами.'''
+    if file_format == 'csv':
+        rows = csv.DictReader(file)
+    else:
+        rows = (json.loads(line) for line in file if line.strip())
+    for row in rows:
+        for field, convert in CONVERTERS.items():
+            if field in row:
+                row[field] = convert(row[field])
+        yield row
+
+
+def batches(rows, size):
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def keep_dates():
+    '''Отключает auto_now и auto_now_add, чтобы сохранить даты из файла.'''
+    fields = [
+        field for model in (Post, Comment) for field in model._meta.fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _users(usernames):
+    '''id пользователей по username; недостающие создаются.'''
+    found = dict(User.objects.filter(
+        username__in=usernames
+    ).values_list('username', 'id'))
+    missing = set(usernames) - set(found)
+    if missing:
+        User.objects.bulk_create(
+            [
+                User(username=username, password=make_password(None))
+                for username in missing
+            ],
+            ignore_conflicts=True,
+        )
+        created = User.objects.filter(username__in=missing)
+        reconcile_authors(created)
+        found.update(created.values_list('username', 'id'))
+    return found
+
+
+def _import_groups(rows):
+    Group.objects.bulk_create(
+        [Group(**row) for row in rows], ignore_conflicts=True
+    )
+
+
+def _import_posts(rows):
+    authors = _users({row['author'] for row in rows})
+    posts = [
+        Post(
+            id=row['id'],
+            text=row['text'],
+            author_id=authors[row['author']],
+            group_id=row['group_id'],
+            image=row.get('image') or '',
+            created=row['created'],
+            updated=row.get('updated') or row['created'],
+        )
+        for row in rows
+    ]
+    Post.objects.bulk_create(posts, ignore_conflicts=True)
+    timeline.fan_out_posts(posts)
+    search.index_documents((post.pk, None, post.text) for post in posts)
+
+
+def _import_comments(rows):
+    authors = _users({row['author'] for row in rows})
+    known = {
+        pk: (path, depth) for pk, path, depth in Comment.objects.filter(
+            pk__in={row['parent_id'] for row in rows} - {None}
+        ).values_list('pk', 'path', 'depth')
+    }
+    comments = []
+    for row in rows:
+        # Ответ без родителя в базе становится корневым комментарием.
+        parent_id = row['parent_id'] if row['parent_id'] in known else None
+        path, depth = known.get(parent_id, ('', -1))
+        known[row['id']] = (path + path_segment(row['id']), depth + 1)
+        comments.append(Comment(
+            id=row['id'],
+            post_id=row['post_id'],
+            parent_id=parent_id,
+            author_id=authors[row['author']],
+            text=row['text'],
+            created=row['created'],
+            path=known[row['id']][0],
+            depth=known[row['id']][1],
+        ))
+    Comment.objects.bulk_create(comments, ignore_conflicts=True)
+    posts = {comment.post_id for comment in comments}
+    reconcile_posts(Post.objects.filter(pk__in=posts))
+    search.index_documents(
+        (comment.post_id, comment.pk, comment.text) for comment in comments
+    )
+    cache.bump(*(scope('post', pk) for pk in posts))
+
+
+def _import_follows(rows):
+    users = _users({row[field] for row in rows for field in FIELDS['follows']})
+    pairs = {
+        (users[row['user']], users[row['author']])
+        for row in rows if row['user'] != row['author']
+    }
+    # Уже существующие подписки не вставятся и не должны попасть в
+    # счётчики.
+    pairs -= set(Follow.objects.filter(
+        user_id__in={user for user, _ in pairs},
+        author_id__in={author for _, author in pairs},
+    ).values_list('user_id', 'author_id'))
+    follows = [
+        Follow(user_id=user, author_id=author) for user, author in pairs
+    ]
+    Follow.objects.bulk_create(follows, ignore_conflicts=True)
+    shift_authors('following_count', Counter(user for user, _ in pairs))
+    followers = Counter(author for _, author in pairs)
+    shift_authors('followers_count', followers)
+    timeline.followers_changed(followers)
+    timeline.backfill_many(follows)
+    readers = {user for user, _ in pairs}
+    authors = {author for _, author in pairs}
+    cache.bump(
+        *(scope('follows', pk) for pk in readers),
+        *(scope('timeline', pk) for pk in readers),
+        *(scope('author', pk) for pk in readers | authors),
+    )
+
+
+IMPORTERS = {
+    'groups': _import_groups,
+    'posts': _import_posts,
+    'comments': _import_comments,
+    'follows': _import_follows,
+}
+
+
+class Checkpoint:
+    '''Число уже загруженных строк каждого файла.'''
+
+    def __init__(self, directory, restart=False):
+        self.path = os.path.join(directory, CHECKPOINT)
+        self.done = {}
+        if not restart and os.path.exists(self.path):
+            with open(self.path) as file:
+                self.done = json.load(file)
+
+    def save(self, name, rows):
+        self.done[name] = rows
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(self.done, file)
+        os.replace(temporary, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def import_file(name, file, file_format, checkpoint, batch_size=BATCH_SIZE):
+    '''Загружает файл модели name с места последней контрольной точки.
+
+    Возвращает число строк, загруженных при этом запуске.
+    '''
+    done = checkpoint.done.get(name, 0)
+    rows = read(file, file_format)
+    deque(islice(rows, done), maxlen=0)
+    loaded = 0
+    with keep_dates():
+        for batch in batches(rows, batch_size):
+            with transaction.atomic():
+                IMPORTERS[name](batch)
+            loaded += len(batch)
+            checkpoint.save(name, done + loaded)
+    return loaded
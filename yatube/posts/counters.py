@@ -0,0 +1,117 @@
+'''Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики сдвигаются одним UPDATE с F()-выражением, поэтому
+параллельные записи не теряют инкременты. Уменьшение никогда не
+опускает счётчик ниже нуля, а расхождения исправляет reconcile_*.
+'''
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+
+def _shift(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def shift_author(user_id, field, delta):
+    '''Сдвигает счётчик field пользователя на delta.
+
+    Если строки со счётчиками ещё нет, она создаётся с пересчитанными
+    значениями, которые уже учитывают текущее изменение.
+    '''
+    updated = _shift(AuthorStats.objects.filter(user_id=user_id), field, delta)
+    if not updated and delta > 0:
+        reconcile_authors(User.objects.filter(pk=user_id))
+
+
+def shift_authors(field, deltas):
+    '''Сдвигает счётчик field нескольких пользователей.
+
+    deltas — Counter {id пользователя: сдвиг}; пользователи с одинаковым
+    сдвигом обновляются одним UPDATE. Недостающие строки со счётчиками
+    создаются пересчётом, как в shift_author.
+    '''
+    known = set(AuthorStats.objects.filter(
+        user_id__in=deltas
+    ).values_list('user_id', flat=True))
+    if set(deltas) - known:
+        reconcile_authors(User.objects.filter(pk__in=set(deltas) - known))
+    users = defaultdict(list)
+    for user_id in known:
+        users[deltas[user_id]].append(user_id)
+    for delta, ids in users.items():
+        _shift(AuthorStats.objects.filter(user_id__in=ids), field, delta)
+
+
+def stats_for(user):
+    '''Возвращает счётчики пользователя, создавая их при отсутствии.'''
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        reconcile_authors(User.objects.filter(pk=user.pk))
+        return AuthorStats.objects.get(user=user)
+
+
+def shift_comments(post_id, delta):
+    '''Сдвигает счётчик комментариев поста на delta.'''
+    _shift(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count(model, field, outer):
+    rows = model.objects.filter(**{field: OuterRef(outer)}).order_by()
+    return Coalesce(
+        Subquery(
+            rows.values(field).annotate(total=Count('id')).values('total')
+        ),
+        0
+    )
+
+
+def reconcile_authors(users=None):
+    '''Пересчитывает счётчики пользователей по данным таблиц.
+
+    Возвращает число строк, в которых было расхождение.
+    '''
+    if users is None:
+        users = User.objects.all()
+    AuthorStats.objects.bulk_create(
+        [
+            AuthorStats(user_id=pk) for pk in users.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    real = {
+        'posts_count': _count(Post, 'author', 'user_id'),
+        'followers_count': _count(Follow, 'author', 'user_id'),
+        'following_count': _count(Follow, 'user', 'user_id'),
+    }
+    stats = AuthorStats.objects.filter(user__in=users)
+    drifted = stats.annotate(
+        **{f'real_{field}': value for field, value in real.items()}
+    ).exclude(
+        **{field: F(f'real_{field}') for field in real}
+    ).count()
+    stats.update(**real)
+    return drifted
+
+
+def reconcile_posts(posts=None):
+    '''Пересчитывает счётчики комментариев.
+
+    Возвращает число постов, в которых было расхождение.
+    '''
+    if posts is None:
+        posts = Post.objects.all()
+    real = _count(Comment, 'post', 'pk')
+    drifted = posts.annotate(real=real).exclude(
+        comments_count=F('real')
+    ).count()
+    posts.update(comments_count=real)
+    return drifted
@@ -0,0 +1,93 @@
+'''Граф подписок с кэшем.
+
+Множество авторов, на которых подписан пользователь, хранится в кэше
+до сброса его области 'follows', поэтому проверка «подписан ли X на Y»
+на странице профиля не обращается к таблице Follow. Число подписчиков
+автора берётся из денормализованного AuthorStats.followers_count.
+
+follow_many и unfollow_many подписывают и отписывают пользователя от
+нескольких авторов за один запрос на запись.
+'''
+from collections import Counter
+
+from django.db import transaction
+
+from core import cache
+from core.cache import scope
+
+from . import snapshots, timeline
+from .counters import shift_authors, stats_for
+from .models import Follow, User
+
+
+def following(user_id):
+    '''Множество id авторов, на которых подписан пользователь.'''
+    return cache.get_or_set(
+        cache.make_key('following', [scope('follows', user_id)]),
+        lambda: frozenset(Follow.objects.filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True))
+    )
+
+
+def is_following(user, author_id):
+    return user.is_authenticated and author_id in following(user.pk)
+
+
+def followers_count(author):
+    return stats_for(author).followers_count
+
+
+def bump_scopes(user_id, author_ids):
+    '''Сбрасывает кэш подписок и ленты пользователя и кэш профилей, где
+    показаны счётчики подписок.'''
+    cache.bump(
+        scope('follows', user_id),
+        scope('timeline', user_id),
+        *(scope('author', pk) for pk in {user_id, *author_ids})
+    )
+
+
+def follow_many(user, author_ids):
+    '''Подписывает пользователя на авторов и возвращает id новых.
+
+    bulk_create не отправляет сигналы, поэтому счётчики, ленты и кэш
+    обновляются здесь же, как при импорте.
+    '''
+    # Запись сверяется с базой, а не с кэшем: он может отставать.
+    new = set(User.objects.filter(
+        pk__in=set(author_ids) - {user.pk}
+    ).exclude(following__user=user).values_list('pk', flat=True))
+    if not new:
+        return set()
+    follows = [Follow(user=user, author_id=pk) for pk in new]
+    with transaction.atomic():
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        shift_authors('followers_count', Counter(new))
+        timeline.followers_changed(Counter(new))
+        shift_authors('following_count', Counter({user.pk: len(new)}))
+        timeline.backfill_many(follows)
+        bump_scopes(user.pk, new)
+        snapshots.schedule(user_ids=new | {user.pk})
+    return new
+
+
+def unfollow_many(user, author_ids):
+    '''Отписывает пользователя от авторов и возвращает число удалённых
+    подписок.
+
+    QuerySet.delete отправляет post_delete для каждой подписки, так что
+    счётчики, ленты и кэш обновляют обработчики сигналов.
+    '''
+    deleted, _ = Follow.objects.filter(
+        user=user, author_id__in=author_ids
+    ).delete()
+    return deleted
+
+
+def follow(user, author):
+    return bool(follow_many(user, [author.pk]))
+
+
+def unfollow(user, author):
+    return bool(unfollow_many(user, [author.pk]))
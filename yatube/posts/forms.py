@@ -1,4 +1,6 @@
-from django.forms import ModelForm, ValidationError
+from django.forms import (
+    HiddenInput, ModelChoiceField, ModelForm, ValidationError
+)
 from .models import Post, Comment
 
 
@@ -15,10 +17,22 @@ class PostForm(ModelForm):
 
 
 class CommentForm(ModelForm):
+    '''С post_id форма принимает и ответ: в скрытом поле parent
+    допустимы только комментарии этого поста.'''
+
     class Meta:
         model = Comment
         fields = ('text',)
 
+    def __init__(self, *args, post_id=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if post_id is not None:
+            self.fields['parent'] = ModelChoiceField(
+                Comment.objects.filter(post_id=post_id),
+                required=False,
+                widget=HiddenInput,
+            )
+
     def clean_text(self):
         data = self.cleaned_data['text']
         if not data:
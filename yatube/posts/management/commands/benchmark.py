@@ -0,0 +1,115 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts import benchmark
+
+MODES = ('client', 'wsgi')
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность и задержки публичных страниц '
+        'на синтетических данных в отдельной базе.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in benchmark.DATASET.items():
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Сколько создать: {name} (по умолчанию {default}).'
+            )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--mode', choices=MODES, action='append',
+            help='Режим замера; по умолчанию все.'
+        )
+        parser.add_argument('--output', help='Файл для отчёта в JSON.')
+        parser.add_argument('--compare', help='Отчёт для сравнения.')
+        parser.add_argument(
+            '--fail-over', type=float,
+            help='Ошибка, если p95 вырос больше чем на столько процентов.'
+        )
+
+    def handle(self, *args, **options):
+        # Как и тестовый раннер, меряем без отладочного режима.
+        settings.DEBUG = False
+        sizes = {name: options[name] for name in benchmark.DATASET}
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            benchmark.seed(options['seed'], **sizes)
+            results = benchmark.run(
+                options['mode'] or MODES,
+                options['requests'],
+                options['warmup'],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        report = {
+            'commit': current_commit(),
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'dataset': sizes,
+            'seed': options['seed'],
+            'requests': options['requests'],
+            'warmup': options['warmup'],
+            'results': results,
+        }
+        self.print_results(results)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.print_comparison(
+                    benchmark.compare(json.load(file), report),
+                    options['fail_over']
+                )
+
+    def print_results(self, results):
+        for mode, scenarios in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(mode))
+            for name, summary in scenarios.items():
+                self.stdout.write(
+                    f'  {name:<18} {summary["rps"]:>8} rps  '
+                    f'p50 {summary["p50_ms"]:>8} ms  '
+                    f'p95 {summary["p95_ms"]:>8} ms  '
+                    f'p99 {summary["p99_ms"]:>8} ms  '
+                    f'ошибок {summary["errors"]}'
+                )
+
+    def print_comparison(self, changes, fail_over):
+        regressions = []
+        for (mode, name), (before, after, change) in changes.items():
+            line = f'{mode} {name}: p95 {before} -> {after} ms ({change:+}%)'
+            if fail_over is not None and change > fail_over:
+                regressions.append(line)
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        if regressions:
+            raise CommandError(
+                'Задержка выросла сверх допустимого:\n'
+                + '\n'.join(regressions)
+            )
@@ -0,0 +1,28 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии и подписки в файлы NDJSON '
+        'или CSV, по одному на модель.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для файлов.')
+        parser.add_argument(
+            '--format', choices=bulk.FORMATS, default='ndjson',
+            help='Формат файлов.'
+        )
+
+    def handle(self, *args, directory, format, **options):
+        os.makedirs(directory, exist_ok=True)
+        for name in bulk.FIELDS:
+            path = os.path.join(directory, bulk.filename(name, format))
+            with open(path, 'w', encoding='utf-8', newline='') as file:
+                count = bulk.export(name, file, format)
+            self.stdout.write(f'{path}: {count}')
+        self.stdout.write(self.style.SUCCESS('Выгрузка завершена.'))
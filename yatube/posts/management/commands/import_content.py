@@ -0,0 +1,43 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает группы, посты, комментарии и подписки из файлов '
+        'export_content. Прерванная загрузка продолжается с последней '
+        'сохранённой пачки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог с файлами.')
+        parser.add_argument(
+            '--format', choices=bulk.FORMATS, default='ndjson',
+            help='Формат файлов.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=bulk.BATCH_SIZE,
+            help='Число строк в одной транзакции.'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать заново, не учитывая контрольную точку.'
+        )
+
+    def handle(self, *args, directory, format, batch_size, restart,
+               **options):
+        checkpoint = bulk.Checkpoint(directory, restart)
+        for name in bulk.FIELDS:
+            path = os.path.join(directory, bulk.filename(name, format))
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding='utf-8', newline='') as file:
+                count = bulk.import_file(
+                    name, file, format, checkpoint, batch_size
+                )
+            self.stdout.write(f'{path}: {count}')
+        checkpoint.remove()
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import snapshots
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает статические копии страниц групп и профилей.'
+
+    def handle(self, *args, **options):
+        if not snapshots.root():
+            raise CommandError('Не задан SNAPSHOT_ROOT.')
+        written = snapshots.publish_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано страниц: {written}.'
+        ))
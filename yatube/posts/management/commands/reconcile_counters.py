@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def handle(self, *args, **options):
+        authors = counters.reconcile_authors()
+        posts = counters.reconcile_posts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: пользователей {authors}, '
+            f'постов {posts}.'
+        ))
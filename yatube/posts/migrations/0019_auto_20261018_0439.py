@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:39
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_auto_20220224_2237'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'get_latest_by': ['created', 'id'], 'ordering': ['-created', '-id']},
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.utils.http import int_to_base36
+
+PATH_STEP = 8
+BATCH_SIZE = 500
+
+
+def fill_paths(apps, schema_editor):
+    # До появления ответов все комментарии были корневыми.
+    Comment = apps.get_model('posts', 'Comment')
+    comments = []
+    for comment in Comment.objects.filter(path='').only('pk').iterator():
+        comment.path = int_to_base36(comment.pk).rjust(PATH_STEP, '0')
+        comments.append(comment)
+        if len(comments) == BATCH_SIZE:
+            Comment.objects.bulk_update(comments, ['path'])
+            comments = []
+    Comment.objects.bulk_update(comments, ['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0029_comment_threads'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,173 @@
+import re
+from collections import Counter
+
+from django.db import migrations
+
+FTS_TABLE = 'posts_search'
+TERM_LENGTH = 64
+BATCH_SIZE = 500
+
+# Копия posts.stemmer на момент миграции: миграция не должна меняться
+# вместе с кодом приложения.
+VOWELS = 'аеиоуыэюя'
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile(r'^[а-я]+$')
+
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE = re.compile(r'(ся|сь)$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+DERIVATIONAL = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+
+def _after_vowel_consonant(word, start):
+    for pos in range(max(start, 1), len(word)):
+        if word[pos] not in VOWELS and word[pos - 1] in VOWELS:
+            return pos + 1
+    return len(word)
+
+
+def _cut(pattern, word):
+    return pattern.sub('', word, count=1)
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC_RE.match(word):
+        return word
+    rv_start = next(
+        (pos + 1 for pos, char in enumerate(word) if char in VOWELS),
+        len(word)
+    )
+    r2_start = _after_vowel_consonant(
+        word, _after_vowel_consonant(word, 0)
+    )
+    head, rv = word[:rv_start], word[rv_start:]
+
+    cut = _cut(PERFECTIVE_GERUND, rv)
+    if cut == rv:
+        rv = _cut(REFLEXIVE, rv)
+        cut = _cut(ADJECTIVE, rv)
+        if cut != rv:
+            cut = _cut(PARTICIPLE, cut)
+        else:
+            cut = _cut(VERB, rv)
+            if cut == rv:
+                cut = _cut(NOUN, rv)
+    rv = cut
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    derivational = DERIVATIONAL.search(rv)
+    if derivational and rv_start + derivational.start() >= r2_start:
+        rv = rv[:derivational.start()]
+
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        cut = _cut(SUPERLATIVE, rv)
+        if cut != rv:
+            rv = cut[:-1] if cut.endswith('нн') else cut
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+    return head + rv
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD_RE.findall(text)]
+
+
+def documents(apps):
+    Comment = apps.get_model('posts', 'Comment')
+    Post = apps.get_model('posts', 'Post')
+    for pk, text in Post.objects.values_list('pk', 'text').iterator():
+        yield pk, None, text
+    for pk, post_id, text in Comment.objects.values_list(
+        'pk', 'post_id', 'text'
+    ).iterator():
+        yield post_id, pk, text
+
+
+def terms_of(text):
+    return [term[:TERM_LENGTH] for term in tokenize(text)]
+
+
+def fill_fts(apps, cursor):
+    cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    rows = []
+    for post_id, comment_id, text in documents(apps):
+        terms = terms_of(text)
+        if not terms:
+            continue
+        # Посты и комментарии делят rowid таблицы: чётные и нечётные.
+        rowid = post_id * 2 if comment_id is None else comment_id * 2 + 1
+        rows.append([rowid, ' '.join(terms), post_id, comment_id])
+        if len(rows) == BATCH_SIZE:
+            insert_fts(cursor, rows)
+            rows = []
+    insert_fts(cursor, rows)
+
+
+def insert_fts(cursor, rows):
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE} (rowid, body, post_id, comment_id) '
+        'VALUES (%s, %s, %s, %s)',
+        rows
+    )
+
+
+def fill_terms(apps):
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    SearchTerm.objects.all().delete()
+    terms = []
+    for post_id, comment_id, text in documents(apps):
+        terms.extend(
+            SearchTerm(
+                term=term,
+                post_id=post_id,
+                comment_id=comment_id,
+                frequency=frequency,
+            )
+            for term, frequency in Counter(terms_of(text)).items()
+        )
+        if len(terms) >= BATCH_SIZE:
+            SearchTerm.objects.bulk_create(terms)
+            terms = []
+    SearchTerm.objects.bulk_create(terms)
+
+
+def fill_search_index(apps, schema_editor):
+    # Индексирует посты и комментарии, написанные до появления поиска.
+    connection = schema_editor.connection
+    if FTS_TABLE in connection.introspection.table_names():
+        with connection.cursor() as cursor:
+            fill_fts(apps, cursor)
+    else:
+        fill_terms(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0030_fill_comment_paths'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,35 @@
+import json
+from collections import Counter
+
+from django.core.files.storage import default_storage
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils.http import int_to_base36
 
 from core.models import CreatedModel
 
 User = get_user_model()
 
 CHAR_NUM = 15
+# Длина звена пути комментария: id в base36, дополненный нулями.
+PATH_STEP = 8
+PATH_LENGTH = 255
+MAX_DEPTH = PATH_LENGTH // PATH_STEP - 1
+FEED_DEFERRED_FIELDS = (
+    'author__password',
+    'author__last_login',
+    'author__is_superuser',
+    'author__is_staff',
+    'author__is_active',
+    'author__email',
+    'author__date_joined',
+    'group__description',
+)
+
+
+def path_segment(pk):
+    '''Звено пути комментария с данным id.'''
+    return int_to_base36(pk).rjust(PATH_STEP, '0')
 
 
 class Group(models.Model):
@@ -17,6 +41,40 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        '''Посты для лент: автор и группа подгружаются одним запросом,
+        неиспользуемые в карточке поля не выбираются.'''
+        return self.select_related('author', 'group').defer(
+            *FEED_DEFERRED_FIELDS
+        )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        '''bulk_create не отправляет сигналы, поэтому счётчики постов
+        затронутых авторов и кэш их лент обновляются здесь.'''
+        from core import cache
+        from .counters import shift_authors
+
+        objs = list(objs)
+        # С ignore_conflicts уже существующие посты не вставляются и не
+        # должны попасть в счётчики.
+        existing = set(self.filter(
+            pk__in=[post.pk for post in objs if post.pk is not None]
+        ).values_list('pk', flat=True))
+        objs = super().bulk_create(objs, *args, **kwargs)
+        shift_authors('posts_count', Counter(
+            post.author_id for post in objs if post.pk not in existing
+        ))
+        authors = {post.author_id for post in objs}
+        groups = {post.group_id for post in objs} - {None}
+        cache.bump(
+            'feed',
+            *(cache.scope('author', pk) for pk in authors),
+            *(cache.scope('group', pk) for pk in groups)
+        )
+        return objs
+
+
 class Post(CreatedModel):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -42,14 +100,54 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    image_variants = models.TextField(blank=True, editable=False)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
-        ordering = ['-created']
+        ordering = ['-created', '-id']
         get_latest_by = ['created', 'id']
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'], name='post_created_idx'
+            ),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='post_author_created_idx'
+            ),
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='post_group_created_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:CHAR_NUM]
 
+    @property
+    def picture_sources(self):
+        '''Варианты картинки для <picture>: тип, srcset и самый широкий
+        файл. Пустой список, пока варианты не построены.'''
+        if not self.image_variants:
+            return []
+        return [
+            {
+                'type': variant['type'],
+                'srcset': ', '.join(
+                    f'{default_storage.url(name)} {width}w'
+                    for name, width in variant['files']
+                ),
+                'src': default_storage.url(variant['files'][-1][0]),
+            }
+            for variant in json.loads(self.image_variants)
+        ]
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
@@ -70,14 +168,46 @@ class Comment(CreatedModel):
         verbose_name='Текст комментария',
         help_text='Оставьте свой комментарий'
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        related_name='replies',
+        blank=True,
+        null=True,
+        verbose_name='Ответ на'
+    )
+    # Цепочка id предков и самого комментария: ветка целиком читается
+    # одним запросом по диапазону путей и сразу в порядке вывода.
+    path = models.CharField(
+        max_length=PATH_LENGTH, blank=True, editable=False
+    )
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
 
     class Meta:
-        ordering = ['-created']
+        ordering = ['-created', '-id']
         get_latest_by = ['created', 'id']
+        indexes = [
+            models.Index(
+                fields=['post', 'depth', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+            models.Index(fields=['path'], name='comment_path_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:CHAR_NUM]
 
+    def save(self, *args, **kwargs):
+        if self.parent and self.parent.depth >= MAX_DEPTH:
+            # Слишком глубокий ответ становится соседом родителя.
+            self.parent = self.parent.parent
+        self.depth = self.parent.depth + 1 if self.parent else 0
+        super().save(*args, **kwargs)
+        if not self.path:
+            prefix = self.parent.path if self.parent else ''
+            self.path = prefix + path_segment(self.pk)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -96,3 +226,87 @@ class Follow(models.Model):
             models.UniqueConstraint(
                 fields=['user', 'author'], name='unique_follow')
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    '''Запись материализованной ленты подписок.
+
+    Поле created копирует дату создания поста, чтобы страница ленты
+    читалась одним проходом по индексу (user, created, post).
+    '''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    created = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created', '-post_id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-post'],
+                name='timeline_user_created_idx'
+            )
+        ]
+
+
+class AuthorStats(models.Model):
+    '''Денормализованные счётчики пользователя.
+
+    Поддерживаются сигналами из posts.signals, расхождения исправляет
+    команда reconcile_counters.
+    '''
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+
+class SearchTerm(models.Model):
+    '''Запись обратного индекса поиска: основа слова и документ.
+
+    Используется, когда база данных не поддерживает FTS5. Для
+    комментария заполнено поле comment, для текста поста оно пустое.
+    '''
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='search_terms',
+    )
+    frequency = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['term', 'post'], name='search_term_post_idx'
+            )
+        ]
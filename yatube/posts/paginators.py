@@ -0,0 +1,261 @@
+import binascii
+import math
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from core import cache
+
+FORWARD = 'n'
+BACKWARD = 'p'
+CURSOR_PARAM = 'cursor'
+PAGE_PARAM = 'page'
+# Больше записей не считается: число страниц становится оценкой снизу.
+COUNT_LIMIT = 10000
+# Номера вокруг текущей страницы и в начале и конце навигации.
+WINDOW_ON_EACH_SIDE = 2
+WINDOW_ON_ENDS = 1
+# id в курсоре — знаковое 64-битное целое, как в базе.
+MAX_KEY = 2 ** 63 - 1
+
+
+def encode_cursor(direction, created, key):
+    '''Упаковывает ключ (created, id) в непрозрачный токен.'''
+    raw = f'{direction}|{created.isoformat()}|{key}'
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def page_number(value, last=None):
+    '''Номер страницы из параметра запроса или None.
+
+    Номера больше last считаются неверными: смещение таких страниц не
+    помещается в SQL и всё равно дальше COUNT_LIMIT.
+    '''
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    if number < 1 or last is not None and number > last:
+        return None
+    return number
+
+
+def decode_cursor(token):
+    '''Распаковывает токен в (direction, created, id).
+
+    Для повреждённого токена возвращает None.
+    '''
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = urlsafe_b64decode(padded.encode()).decode()
+        direction, created, pk = raw.split('|')
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+    if direction not in (FORWARD, BACKWARD) or created is None:
+        return None
+    if not -MAX_KEY - 1 <= pk <= MAX_KEY:
+        return None
+    return direction, created, pk
+
+
+class CursorPaginator(Paginator):
+    '''Пагинатор по ключу (created, id) без COUNT(*) и OFFSET.
+
+    Страница, полученная через get_cursor_page, хранит токены соседних
+    страниц в атрибутах next_cursor и previous_cursor. Старые ссылки
+    вида ?page=N по-прежнему обслуживаются через смещение; вместе с
+    курсором номер только подписывает страницу.
+    '''
+    key_field = 'id'
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(
+            object_list.order_by('-created', '-' + self.key_field),
+            per_page,
+            **kwargs
+        )
+
+    @property
+    def max_page(self):
+        '''Последний номер, который обслуживается через смещение.'''
+        return COUNT_LIMIT // self.per_page + 1
+
+    def get_cursor_page(self, cursor=None, number=None):
+        decoded = decode_cursor(cursor) if cursor else None
+        number = page_number(number, self.max_page)
+        if decoded is not None:
+            return self._keyset_page(*decoded, number)
+        return self._offset_page(number)
+
+    def get_cached_page(self, scopes, cursor=None, number=None):
+        '''Как get_cursor_page, но состав страницы берётся из кэша,
+        пока не сброшена ни одна из областей scopes.'''
+        key = cache.make_key('feed_page', scopes, cursor, number)
+        cached = cache.get(key)
+        if cached is not None:
+            ids, number, has_next, has_previous = cached
+            found = self._in_bulk(ids)
+            rows = [found[pk] for pk in ids if pk in found]
+            return self._build_page(rows, number, has_next, has_previous)
+        page = self.get_cursor_page(cursor, number)
+        cache.set(key, (
+            [post.pk for post in page.object_list],
+            page.number,
+            page.next_cursor is not None,
+            page.previous_cursor is not None,
+        ))
+        return page
+
+    def restore_page(self, state):
+        '''Страница из состояния page_state, без запросов к базе.'''
+        return self._build_page(*state)
+
+    def _in_bulk(self, ids):
+        return self.object_list.in_bulk(ids)
+
+    def _select(self, queryset, key_field, direction, seek, limit,
+                offset=0):
+        '''Выбирает limit строк queryset, следующих за ключом seek
+        в направлении direction.'''
+        if seek is not None:
+            created, key = seek
+            lookup = 'lt' if direction == FORWARD else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'created__{lookup}': created})
+                | Q(created=created, **{f'{key_field}__{lookup}': key})
+            )
+        if direction == BACKWARD:
+            queryset = queryset.reverse()
+        return list(queryset[offset:offset + limit])
+
+    def _rows(self, direction, seek, limit, offset=0):
+        return self._select(
+            self.object_list, self.key_field, direction, seek, limit, offset
+        )
+
+    def _keyset_page(self, direction, created, key, number=None):
+        rows = self._rows(direction, (created, key), self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == FORWARD:
+            return self._build_page(rows, number, has_more, True)
+        rows.reverse()
+        return self._build_page(rows, number, True, has_more)
+
+    def _offset_page(self, number):
+        number = number or 1
+        bottom = (number - 1) * self.per_page
+        rows = self._rows(FORWARD, None, self.per_page + 1, bottom)
+        if not rows and number > 1:
+            # Страница за концом ленты: показывается последняя.
+            last = max(1, math.ceil(self.count / self.per_page))
+            return self._offset_page(last if last < number else 1)
+        has_next = len(rows) > self.per_page
+        return self._build_page(
+            rows[:self.per_page], number, has_next, number > 1
+        )
+
+    def _key(self, row):
+        return row.created, row.pk
+
+    def _build_page(self, rows, number, has_next, has_previous):
+        page = Page(rows, number, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if rows and has_next:
+            page.next_cursor = encode_cursor(FORWARD, *self._key(rows[-1]))
+        if rows and has_previous:
+            page.previous_cursor = encode_cursor(
+                BACKWARD, *self._key(rows[0])
+            )
+        return page
+
+
+class CountedCursorPaginator(CursorPaginator):
+    '''CursorPaginator с окном номеров страниц в page.page_window.
+
+    Число записей берётся готовым (count, например из счётчика автора)
+    или считается не дальше COUNT_LIMIT и кэшируется до сброса областей
+    scopes, которые сбрасываются при создании и удалении постов. Если
+    записей больше, число остаётся оценкой снизу и последняя страница
+    в окно не попадает.
+    '''
+
+    def __init__(self, object_list, per_page, scopes=(), count=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.scopes = scopes
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        return cache.get_or_set(
+            cache.make_key('feed_count', self.scopes),
+            lambda: self.object_list.order_by()[:COUNT_LIMIT + 1].count()
+        )
+
+    @property
+    def count_is_estimate(self):
+        return self.known_count is None and self.count > COUNT_LIMIT
+
+    def page_window(self, number):
+        '''Номера страниц вокруг number; None — пропуск в нумерации.'''
+        last = self.num_pages
+        pages = {
+            *range(1, WINDOW_ON_ENDS + 1),
+            *range(number - WINDOW_ON_EACH_SIDE,
+                   number + WINDOW_ON_EACH_SIDE + 1),
+        }
+        if not self.count_is_estimate:
+            pages.update(range(last - WINDOW_ON_ENDS + 1, last + 1))
+        window = []
+        previous = 0
+        for page in sorted(page for page in pages if 1 <= page <= last):
+            if page - previous > 1:
+                window.append(None)
+            window.append(page)
+            previous = page
+        if self.count_is_estimate:
+            window.append(None)
+        return window
+
+    def _build_page(self, rows, number, has_next, has_previous):
+        if number and not has_next and 'count' not in self.__dict__:
+            # На последней странице число записей известно без запроса.
+            self.count = (number - 1) * self.per_page + len(rows)
+        page = super()._build_page(rows, number, has_next, has_previous)
+        page.page_window = self.page_window(number) if number else []
+        return page
+
+
+def page_state(page):
+    '''Строки страницы и наличие соседних страниц, например для кэша.'''
+    return (
+        list(page.object_list),
+        page.number,
+        page.next_cursor is not None,
+        page.previous_cursor is not None,
+    )
+
+
+def paginate(request, object_list, per_page, scopes=None,
+             paginator_class=CursorPaginator, **kwargs):
+    '''Возвращает страницу ленты по параметрам запроса.
+
+    Если заданы области scopes, состав страницы кэшируется до их сброса.
+    '''
+    if issubclass(paginator_class, CountedCursorPaginator):
+        kwargs.setdefault('scopes', scopes)
+    paginator = paginator_class(object_list, per_page, **kwargs)
+    cursor = request.GET.get(CURSOR_PARAM)
+    number = request.GET.get(PAGE_PARAM)
+    if scopes:
+        return paginator.get_cached_page(scopes, cursor, number)
+    return paginator.get_cursor_page(cursor, number)
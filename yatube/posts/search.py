@@ -0,0 +1,233 @@
+'''Полнотекстовый поиск по постам и комментариям.
+
+Тексты разбиваются на основы слов (posts.stemmer) и складываются в
+обратный индекс: на SQLite — в виртуальную таблицу FTS5 с ранжированием
+BM25, на остальных базах — в таблицу SearchTerm с ранжированием TF-IDF.
+Индекс обновляется сигналами при сохранении и удалении постов и
+комментариев, а полностью перестраивается командой rebuild_search_index.
+'''
+import math
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import (
+    Case, Count, F, FloatField, Q, Sum, Value, When
+)
+
+from .models import Comment, Post, SearchTerm
+from .stemmer import tokenize
+
+FTS_TABLE = 'posts_search'
+RESULTS_LIMIT = 200
+MAX_TERMS = 10
+TERM_LENGTH = 64
+# Совпадение в комментарии весит меньше совпадения в тексте поста.
+COMMENT_WEIGHT = 0.5
+
+_fts_available = {}
+
+
+def _rowid(post_id, comment_id):
+    # Посты и комментарии делят rowid таблицы: чётные и нечётные.
+    if comment_id is None:
+        return post_id * 2
+    return comment_id * 2 + 1
+
+
+class FtsIndex:
+    '''Индекс в виртуальной таблице FTS5.
+
+    Документ находится, если все слова запроса есть в тексте поста или
+    в одном из комментариев к нему.
+    '''
+
+    def add(self, post_id, comment_id, terms, replace=True):
+        self.add_many([(post_id, comment_id, terms)], replace)
+
+    def add_many(self, documents, replace=True):
+        '''Добавляет документы (post_id, comment_id, основы).'''
+        rows = [
+            (_rowid(post_id, comment_id), post_id, comment_id, terms)
+            for post_id, comment_id, terms in documents
+        ]
+        with connection.cursor() as cursor:
+            if replace:
+                cursor.executemany(
+                    f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                    [[rowid] for rowid, *_ in rows]
+                )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} '
+                '(rowid, body, post_id, comment_id) '
+                'VALUES (%s, %s, %s, %s)',
+                [
+                    [rowid, ' '.join(terms), post_id, comment_id]
+                    for rowid, post_id, comment_id, terms in rows
+                    if terms
+                ]
+            )
+
+    def remove(self, post_id, comment_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [_rowid(post_id, comment_id)]
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, terms, limit):
+        # Основы состоят из букв и цифр, кавычки в них не встречаются.
+        match = ' '.join(f'"{term}"' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s '
+                'GROUP BY post_id '
+                'ORDER BY MIN(CASE WHEN comment_id IS NULL '
+                'THEN rank ELSE rank * %s END), post_id DESC '
+                'LIMIT %s',
+                [match, COMMENT_WEIGHT, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class TermIndex:
+    '''Индекс в таблице SearchTerm для баз без FTS5.
+
+    Пост находится, если все слова запроса есть в нём самом или в
+    комментариях к нему.
+    '''
+
+    def add(self, post_id, comment_id, terms, replace=True):
+        self.add_many([(post_id, comment_id, terms)], replace)
+
+    def add_many(self, documents, replace=True):
+        '''Добавляет документы (post_id, comment_id, основы).'''
+        documents = list(documents)
+        if replace:
+            posts = [pk for pk, comment_id, _ in documents if not comment_id]
+            comments = [pk for _, pk, _ in documents if pk]
+            SearchTerm.objects.filter(
+                Q(post_id__in=posts, comment=None) | Q(comment_id__in=comments)
+            ).delete()
+        SearchTerm.objects.bulk_create([
+            SearchTerm(
+                term=term,
+                post_id=post_id,
+                comment_id=comment_id,
+                frequency=frequency,
+            )
+            for post_id, comment_id, terms in documents
+            for term, frequency in Counter(terms).items()
+        ])
+
+    def remove(self, post_id, comment_id):
+        SearchTerm.objects.filter(
+            post_id=post_id, comment_id=comment_id
+        ).delete()
+
+    def clear(self):
+        SearchTerm.objects.all().delete()
+
+    def search(self, terms, limit):
+        postings = SearchTerm.objects.filter(term__in=terms)
+        frequencies = dict(
+            postings.order_by().values('term').annotate(
+                posts=Count('post', distinct=True)
+            ).values_list('term', 'posts')
+        )
+        if len(frequencies) < len(terms):
+            return []
+        documents = Post.objects.count()
+        idf = Case(
+            *(
+                When(term=term, then=Value(math.log(1 + documents / posts)))
+                for term, posts in frequencies.items()
+            ),
+            output_field=FloatField()
+        )
+        weight = Case(
+            When(comment__isnull=True, then=Value(1.0)),
+            default=Value(COMMENT_WEIGHT),
+            output_field=FloatField()
+        )
+        return list(
+            postings.order_by().values('post').annotate(
+                matched=Count('term', distinct=True),
+                score=Sum(
+                    F('frequency') * idf * weight, output_field=FloatField()
+                ),
+            ).filter(
+                matched=len(terms)
+            ).order_by('-score', '-post').values_list(
+                'post', flat=True
+            )[:limit]
+        )
+
+
+def get_index():
+    '''Индекс, подходящий для текущей базы данных.'''
+    name = connection.settings_dict['NAME']
+    if name not in _fts_available:
+        _fts_available[name] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return FtsIndex() if _fts_available[name] else TermIndex()
+
+
+def terms_of(text):
+    '''Основы слов текста в том виде, в каком они хранятся в индексе.'''
+    return [term[:TERM_LENGTH] for term in tokenize(text)]
+
+
+def index_post(post):
+    get_index().add(post.pk, None, terms_of(post.text))
+
+
+def index_comment(comment):
+    get_index().add(comment.post_id, comment.pk, terms_of(comment.text))
+
+
+def index_documents(documents):
+    '''Индексирует пачку документов (post_id, comment_id, текст).'''
+    get_index().add_many(
+        (post_id, comment_id, terms_of(text))
+        for post_id, comment_id, text in documents
+    )
+
+
+def unindex_post(post):
+    get_index().remove(post.pk, None)
+
+
+def unindex_comment(comment):
+    get_index().remove(comment.post_id, comment.pk)
+
+
+def search(query, limit=RESULTS_LIMIT):
+    '''Возвращает id постов, подходящих под запрос, лучшие первыми.'''
+    terms = list(dict.fromkeys(terms_of(query)))[:MAX_TERMS]
+    if not terms:
+        return []
+    return get_index().search(terms, limit)
+
+
+def rebuild():
+    '''Перестраивает индекс целиком и возвращает число документов.'''
+    index = get_index()
+    documents = 0
+    with transaction.atomic():
+        index.clear()
+        for pk, text in Post.objects.values_list('pk', 'text').iterator():
+            index.add(pk, None, terms_of(text), replace=False)
+            documents += 1
+        for pk, post_id, text in Comment.objects.values_list(
+            'pk', 'post_id', 'text'
+        ).iterator():
+            index.add(post_id, pk, terms_of(text), replace=False)
+            documents += 1
+    return documents
@@ -0,0 +1,143 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import cache
+from core.cache import scope
+
+from . import counters, follows, search, snapshots, thumbnails, timeline
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+SNAPSHOT_NAMES = {Group: ('group', 'slug'), User: ('profile', 'username')}
+
+
+def bump_post_feeds(post, *group_ids):
+    '''Сбрасывает кэш ленты, автора и групп, где показывается пост.'''
+    cache.bump(
+        'feed',
+        scope('post', post.pk),
+        scope('author', post.author_id),
+        *(scope('group', pk) for pk in {*group_ids} - {None})
+    )
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_state(sender, instance, raw=False, **kwargs):
+    instance._saved_group_id = None
+    instance._saved_image = ''
+    if instance.pk and not raw:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, '')
+        )
+    if instance.image.name != instance._saved_image:
+        instance.image_variants = ''
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_post(instance)
+    if instance.image and instance.image.name != instance._saved_image:
+        thumbnails.schedule_post(instance)
+    if created:
+        counters.shift_author(instance.author_id, 'posts_count', 1)
+        timeline.fan_out_post(instance)
+        bump_post_feeds(instance, instance.group_id)
+    elif instance._saved_group_id != instance.group_id:
+        bump_post_feeds(
+            instance, instance._saved_group_id, instance.group_id
+        )
+    else:
+        cache.bump(scope('post', instance.pk))
+    snapshots.schedule(
+        {instance._saved_group_id, instance.group_id}, [instance.author_id]
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.shift_author(instance.author_id, 'posts_count', -1)
+    search.unindex_post(instance)
+    bump_post_feeds(instance, instance.group_id)
+    snapshots.schedule([instance.group_id], [instance.author_id])
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if raw or not instance.post_id:
+        return
+    search.index_comment(instance)
+    if created:
+        counters.shift_comments(instance.post_id, 1)
+    cache.bump(scope('post', instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id:
+        counters.shift_comments(instance.post_id, -1)
+        search.unindex_comment(instance)
+        cache.bump(scope('post', instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache.bump(scope('group', instance.pk))
+        snapshots.schedule([instance.pk])
+
+
+@receiver(pre_save, sender=Group)
+@receiver(pre_save, sender=User)
+def remove_renamed_snapshots(sender, instance, raw=False, **kwargs):
+    '''Копии под старым slug или username удаляются при переименовании,
+    копии профиля перестраиваются под новым.'''
+    if raw or not instance.pk or not snapshots.root():
+        return
+    kind, field = SNAPSHOT_NAMES[sender]
+    saved = sender.objects.filter(pk=instance.pk).values_list(
+        field, flat=True
+    ).first()
+    if saved and saved != getattr(instance, field):
+        snapshots.remove(kind, saved)
+        if sender is User:
+            snapshots.schedule(user_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    snapshots.remove('group', instance.slug)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    snapshots.remove('profile', instance.username)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.shift_author(instance.author_id, 'followers_count', 1)
+        counters.shift_author(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance)
+        timeline.followers_changed({instance.author_id: 1})
+        follows.bump_scopes(instance.user_id, [instance.author_id])
+        snapshots.schedule(user_ids=[instance.user_id, instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.shift_author(instance.author_id, 'followers_count', -1)
+    counters.shift_author(instance.user_id, 'following_count', -1)
+    timeline.purge(instance)
+    timeline.followers_changed({instance.author_id: -1})
+    follows.bump_scopes(instance.user_id, [instance.author_id])
+    snapshots.schedule(user_ids=[instance.user_id, instance.author_id])
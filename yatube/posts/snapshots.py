@@ -0,0 +1,164 @@
+'''Статические копии страниц групп и профилей для анонимных читателей.
+
+Первые SNAPSHOT_PAGES страниц каждой группы и каждого профиля
+рендерятся для анонимного пользователя в файлы под SNAPSHOT_ROOT:
+
+    group/<slug>/index.html, group/<slug>/page-2.html, ...
+    profile/<username>/index.html, ...
+
+Фронтовый веб-сервер отдаёт их запросам без cookie сессии и без
+?cursor=, не обращаясь к Django (пример для nginx — в README). Файл
+пишется во временный рядом и подменяется через os.replace, поэтому
+сервер никогда не видит наполовину записанную страницу.
+
+Копии группы и автора перестраиваются фоновой задачей, когда в
+них появляется, меняется или исчезает пост; publish_snapshots
+перестраивает всё. Пока SNAPSHOT_ROOT не задан, копии не пишутся.
+'''
+import math
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+from django.urls import reverse
+
+from core.tasks import task
+
+from . import views
+from .counters import stats_for
+from .models import Group, Post, User
+from .paginators import PAGE_PARAM
+
+PAGES = 3
+INDEX = 'index.html'
+
+
+def root():
+    return getattr(settings, 'SNAPSHOT_ROOT', None)
+
+
+def pages():
+    return getattr(settings, 'SNAPSHOT_PAGES', PAGES)
+
+
+def page_filename(number):
+    return INDEX if number == 1 else f'page-{number}.html'
+
+
+def snapshot_dir(kind, name):
+    return os.path.join(root(), kind, name)
+
+
+def write_atomic(path, content):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(content)
+        # mkstemp создаёт файл с правами 0600, веб-серверу нужно чтение.
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def _render(view, path, number, *args):
+    query = {PAGE_PARAM: number} if number > 1 else {}
+    request = RequestFactory().get(path, query)
+    request.user = AnonymousUser()
+    return view(request, *args).content
+
+
+def _publish(kind, name, view, path, posts_count, *args):
+    '''Рендерит первые страницы и удаляет копии лишних страниц.'''
+    directory = snapshot_dir(kind, name)
+    count = max(1, math.ceil(posts_count / views.POSTS_AMOUNT))
+    count = min(count, pages())
+    for number in range(1, count + 1):
+        write_atomic(
+            os.path.join(directory, page_filename(number)),
+            _render(view, path, number, *args)
+        )
+    for number in range(count + 1, pages() + 1):
+        stale = os.path.join(directory, page_filename(number))
+        if os.path.exists(stale):
+            os.remove(stale)
+    return count
+
+
+@task(unique=True)
+def publish_group(group_id):
+    '''Перестраивает копии группы и возвращает число страниц.'''
+    group = Group.objects.filter(pk=group_id).first()
+    if group is None:
+        return 0
+    return _publish(
+        'group', group.slug, views.group_posts,
+        reverse('posts:group_list', args=[group.slug]),
+        group.posts.count(), group.slug
+    )
+
+
+@task(unique=True)
+def publish_profile(user_id):
+    '''Перестраивает копии профиля и возвращает число страниц.'''
+    author = User.objects.select_related('stats').filter(pk=user_id).first()
+    if author is None:
+        return 0
+    return _publish(
+        'profile', author.username, views.profile,
+        reverse('posts:profile', args=[author.username]),
+        stats_for(author).posts_count, author.username
+    )
+
+
+def remove(kind, name):
+    if not root():
+        return
+    directory = snapshot_dir(kind, name)
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+
+
+def publish_all():
+    '''Перестраивает все копии и удаляет копии исчезнувших групп и
+    пользователей. Возвращает число записанных страниц.'''
+    written = 0
+    for kind, model, field, publish in (
+        ('group', Group, 'slug', publish_group),
+        ('profile', User, 'username', publish_profile),
+    ):
+        names = set()
+        for pk, name in model.objects.values_list('pk', field).iterator():
+            names.add(name)
+            written += publish(pk)
+        directory = os.path.join(root(), kind)
+        if os.path.isdir(directory):
+            for name in set(os.listdir(directory)) - names:
+                remove(kind, name)
+    return written
+
+
+def schedule(group_ids=(), user_ids=()):
+    '''Ставит перестройку копий групп и профилей в фоновую очередь.'''
+    if not root():
+        return
+    for pk in {*group_ids} - {None}:
+        publish_group.delay(pk)
+    for pk in {*user_ids} - {None}:
+        publish_profile.delay(pk)
+
+
+def schedule_posts(post_ids):
+    '''Перестраивает копии групп и авторов постов post_ids.'''
+    if not root():
+        return
+    rows = list(Post.objects.filter(pk__in=post_ids).values_list(
+        'group_id', 'author_id'
+    ))
+    schedule({group for group, _ in rows}, {author for _, author in rows})
@@ -0,0 +1,92 @@
+'''Стеммер Портера (Snowball) для русского языка.
+
+Слова в других алфавитах возвращаются без изменений, только в нижнем
+регистре, поэтому смешанный текст индексируется корректно.
+'''
+import re
+
+VOWELS = 'аеиоуыэюя'
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile(r'^[а-я]+$')
+
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE = re.compile(r'(ся|сь)$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+DERIVATIONAL = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+
+def _after_vowel_consonant(word, start):
+    '''Начало области после первой пары «гласная, согласная».'''
+    for pos in range(max(start, 1), len(word)):
+        if word[pos] not in VOWELS and word[pos - 1] in VOWELS:
+            return pos + 1
+    return len(word)
+
+
+def _cut(pattern, word):
+    return pattern.sub('', word, count=1)
+
+
+def stem(word):
+    '''Возвращает основу слова word.'''
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC_RE.match(word):
+        return word
+    rv_start = next(
+        (pos + 1 for pos, char in enumerate(word) if char in VOWELS),
+        len(word)
+    )
+    r2_start = _after_vowel_consonant(
+        word, _after_vowel_consonant(word, 0)
+    )
+    head, rv = word[:rv_start], word[rv_start:]
+
+    cut = _cut(PERFECTIVE_GERUND, rv)
+    if cut == rv:
+        rv = _cut(REFLEXIVE, rv)
+        cut = _cut(ADJECTIVE, rv)
+        if cut != rv:
+            cut = _cut(PARTICIPLE, cut)
+        else:
+            cut = _cut(VERB, rv)
+            if cut == rv:
+                cut = _cut(NOUN, rv)
+    rv = cut
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    derivational = DERIVATIONAL.search(rv)
+    if derivational and rv_start + derivational.start() >= r2_start:
+        rv = rv[:derivational.start()]
+
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        cut = _cut(SUPERLATIVE, rv)
+        if cut != rv:
+            rv = cut[:-1] if cut.endswith('нн') else cut
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+    return head + rv
+
+
+def tokenize(text):
+    '''Основы всех слов текста в порядке их следования.'''
+    return [stem(word) for word in WORD_RE.findall(text)]
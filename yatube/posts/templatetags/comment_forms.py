@@ -0,0 +1,16 @@
+from django import template
+
+from ..forms import CommentForm
+
+register = template.Library()
+
+
+@register.filter
+def reply_form(comment):
+    '''Форма ответа на комментарий: текст и скрытое поле parent.'''
+    form = CommentForm(
+        post_id=comment.post_id, initial={'parent': comment.pk},
+        auto_id=False
+    )
+    form.fields['text'].widget.attrs.update(rows=2)
+    return form
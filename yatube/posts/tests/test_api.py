@@ -0,0 +1,171 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import follows
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {num}'
+            )
+            for num in range(12)
+        ]
+        cls.post = cls.posts[-1]
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ApiTest.reader)
+
+    def test_feeds(self):
+        """JSON-ленты отдают посты страницей со ссылкой-курсором."""
+        urls = {
+            reverse('posts:api_index'): self.client,
+            reverse('posts:api_group_list', args=['group']): self.client,
+            reverse('posts:api_profile', args=['author']): self.client,
+            reverse('posts:api_follow_index'): self.authorized_client,
+        }
+        for url, client in urls.items():
+            with self.subTest(url=url):
+                data = client.get(url).json()
+                self.assertEqual(len(data['results']), 10)
+                self.assertEqual(data['results'][0]['id'], self.post.pk)
+                self.assertEqual(data['results'][0]['author'], 'author')
+                self.assertEqual(data['results'][0]['group'], 'group')
+                data = client.get(
+                    url, {'cursor': data['next_cursor']}
+                ).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [self.posts[1].pk, self.posts[0].pk]
+                )
+                self.assertIsNone(data['next_cursor'])
+
+    def test_post_detail(self):
+        """Пост отдаётся вместе с первой страницей комментариев."""
+        data = self.client.get(
+            reverse('posts:api_post_detail', args=[self.post.pk])
+        ).json()
+        self.assertEqual(data['post']['text'], self.post.text)
+        self.assertEqual(data['post']['comments_count'], 1)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']['results']],
+            ['Комментарий']
+        )
+        response = self.client.get(
+            reverse('posts:api_post_detail', args=[0])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_detail_replies(self):
+        """Комментарии поста отдаются вместе с ветками ответов."""
+        root = Comment.objects.get(post=self.post)
+        reply = Comment.objects.create(
+            post=self.post, author=self.author, parent=root, text='Ответ'
+        )
+        data = self.client.get(
+            reverse('posts:api_post_detail', args=[self.post.pk])
+        ).json()
+        replies = data['comments']['results'][0]['replies']
+        self.assertEqual(len(replies), 1)
+        self.assertEqual(replies[0]['id'], reply.pk)
+        self.assertEqual(replies[0]['parent'], root.pk)
+        self.assertEqual(replies[0]['depth'], 1)
+        self.assertEqual(replies[0]['text'], 'Ответ')
+
+    def test_follow_index_private(self):
+        """Лента подписок не сохраняется в общих кэшах."""
+        url = reverse('posts:api_follow_index')
+        response = self.authorized_client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_follow_requires_login(self):
+        """Лента подписок без авторизации отвечает 401."""
+        response = self.client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_conditional_get(self):
+        """Повторный запрос получает 304 без запросов к базе."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Изменённый пост'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(
+            response.json()['results'][0]['text'], 'Изменённый пост'
+        )
+
+    def test_group_and_profile_not_modified(self):
+        """Группа и профиль отвечают 304 одним запросом к базе."""
+        for url in (
+            reverse('posts:api_group_list', args=['group']),
+            reverse('posts:api_profile', args=['author']),
+        ):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(1):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_profile_counts_follow_changes(self):
+        """Подписка и отписка сбрасывают кэш профилей обоих."""
+        url = reverse('posts:api_profile', args=['author'])
+        reader_url = reverse('posts:api_profile', args=['reader'])
+        fan = User.objects.create_user(username='fan')
+        self.client.get(url)
+        self.client.get(reader_url)
+        follows.follow_many(fan, [self.author.pk, self.reader.pk])
+        self.assertEqual(
+            self.client.get(url).json()['author']['followers_count'], 2
+        )
+        self.assertEqual(
+            self.client.get(reader_url).json()['author']['followers_count'],
+            1
+        )
+        follows.unfollow(fan, self.author)
+        self.assertEqual(
+            self.client.get(url).json()['author']['followers_count'], 1
+        )
+        Follow.objects.create(user=self.author, author=self.reader)
+        self.assertEqual(
+            self.client.get(url).json()['author']['following_count'], 1
+        )
+
+    def test_read_only(self):
+        """API принимает только безопасные методы."""
+        response = self.client.post(reverse('posts:api_index'))
+        self.assertEqual(response.status_code, 405)
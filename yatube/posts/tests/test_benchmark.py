@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .. import benchmark
+from ..models import Comment, Follow, Group, Post, User
+
+SIZES = {'users': 5, 'groups': 2, 'posts': 10, 'follows': 4, 'comments': 6}
+
+
+class BenchmarkTest(TestCase):
+    def test_percentiles(self):
+        '''Перцентили считаются по методу ближайшего ранга.'''
+        latencies = [num / 1000 for num in range(1, 101)]
+        summary = benchmark.summarize(latencies, 0, 1)
+        self.assertEqual(summary['p50_ms'], 50)
+        self.assertEqual(summary['p95_ms'], 95)
+        self.assertEqual(summary['p99_ms'], 99)
+        self.assertEqual(summary['rps'], 100)
+
+    def test_seed_and_run(self):
+        '''Данные создаются в заданном объёме, сценарии проходят без
+        ошибок.'''
+        benchmark.seed(**SIZES)
+        counts = {
+            'users': User.objects.count() - 1,
+            'groups': Group.objects.count(),
+            'posts': Post.objects.count(),
+            'follows': Follow.objects.count(),
+            'comments': Comment.objects.count(),
+        }
+        self.assertEqual(counts, SIZES)
+        results = benchmark.run(('client',), requests_count=2, warmup=0)
+        self.assertEqual(
+            set(results['client']),
+            {scenario.name for scenario in benchmark.scenarios()}
+        )
+        for name, summary in results['client'].items():
+            with self.subTest(scenario=name):
+                self.assertEqual(summary['errors'], 0)
+
+    def test_run_does_not_touch_server_cache(self):
+        '''Замер идёт в отдельном кэше: кэш сервера не сбрасывается.'''
+        cache.set('server', 'value')
+        with benchmark.isolated_cache():
+            self.assertIsNone(cache.get('server'))
+            cache.set('benchmark', 'value')
+        self.assertEqual(cache.get('server'), 'value')
+        self.assertIsNone(cache.get('benchmark'))
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'core.cache_backend.SQLiteCache',
+        'LOCATION': '/nonexistent/cache.sqlite3',
+    }})
+    def test_file_cache_moved_to_temporary_directory(self):
+        '''Файловый кэш замера лежит во временном каталоге.'''
+        with benchmark.isolated_cache():
+            cache.set('key', 'value')
+            self.assertEqual(cache.get('key'), 'value')
+
+    def test_compare(self):
+        '''Сравнение отчётов показывает изменение p95 в процентах.'''
+        old = {'results': {'client': {'index': {'p95_ms': 10}}}}
+        new = {'results': {'client': {
+            'index': {'p95_ms': 12}, 'profile': {'p95_ms': 5}
+        }}}
+        self.assertEqual(
+            benchmark.compare(old, new), {('client', 'index'): (10, 12, 20.0)}
+        )
@@ -0,0 +1,161 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import bulk, search
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+class BulkContentTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост про котов'
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.reader, text='Пост, "с кавычками"\nи переносом'
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий про собак'
+        )
+        cls.reply = Comment.objects.create(
+            post=cls.post, author=cls.author, parent=cls.comment,
+            text='Ответ'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def snapshot(self):
+        return {
+            'groups': list(Group.objects.values_list(
+                'id', 'title', 'slug', 'description'
+            )),
+            'posts': list(Post.objects.order_by('pk').values_list(
+                'id', 'text', 'author__username', 'group_id', 'created',
+                'updated', 'comments_count'
+            )),
+            'comments': list(Comment.objects.order_by('pk').values_list(
+                'id', 'post_id', 'parent_id', 'path', 'depth', 'created'
+            )),
+            'follows': list(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+        }
+
+    def round_trip(self, file_format, **options):
+        call_command(
+            'export_content', self.directory, format=file_format,
+            stdout=StringIO()
+        )
+        before = self.snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        call_command(
+            'import_content', self.directory, format=file_format,
+            stdout=StringIO(), **options
+        )
+        return before
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка в пустую базу сохраняют все данные."""
+        for file_format in bulk.FORMATS:
+            with self.subTest(format=file_format):
+                before = self.round_trip(file_format, batch_size=1)
+                self.assertEqual(self.snapshot(), before)
+
+    def test_derived_data(self):
+        """Загрузка строит ленты подписок, счётчики и поисковый индекс."""
+        self.round_trip('ndjson')
+        author = User.objects.get(username='author')
+        reader = User.objects.get(username='reader')
+        self.assertEqual(author.stats.posts_count, 1)
+        self.assertEqual(author.stats.followers_count, 1)
+        self.assertEqual(reader.stats.following_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=reader, post_id=self.post.pk
+        ).exists())
+        self.assertEqual(search.search('котов'), [self.post.pk])
+        self.assertEqual(search.search('собак'), [self.post.pk])
+        self.assertFalse(author.has_usable_password())
+
+    def test_import_into_filled_database(self):
+        """Повторная загрузка не меняет счётчики, новые данные сдвигают."""
+        call_command('export_content', self.directory, stdout=StringIO())
+        with open(os.path.join(self.directory, 'posts.ndjson'), 'a') as file:
+            file.write(json.dumps({
+                'id': self.post.pk + 100, 'text': 'Новый пост',
+                'author': 'author', 'group_id': None,
+                'created': '2020-01-01T00:00:00+00:00',
+            }) + '\n')
+        with open(os.path.join(self.directory, 'follows.ndjson'), 'a') as file:
+            file.write(json.dumps({'user': 'author', 'author': 'reader'}))
+        call_command(
+            'import_content', self.directory, stdout=StringIO()
+        )
+        author = User.objects.get(username='author')
+        reader = User.objects.get(username='reader')
+        self.assertEqual(author.stats.posts_count, 2)
+        self.assertEqual(author.stats.followers_count, 1)
+        self.assertEqual(author.stats.following_count, 1)
+        self.assertEqual(reader.stats.posts_count, 1)
+        self.assertEqual(reader.stats.followers_count, 1)
+        self.assertEqual(reader.stats.following_count, 1)
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=author, post_id=self.other_post.pk
+        ).count(), 1)
+
+    def test_resume_from_checkpoint(self):
+        """Прерванная загрузка продолжается с контрольной точки."""
+        call_command(
+            'export_content', self.directory, stdout=StringIO()
+        )
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        import_comments = bulk.IMPORTERS['comments']
+        calls = []
+
+        def fail_on_reply(rows):
+            calls.append(rows)
+            if len(calls) > 1:
+                raise RuntimeError
+            import_comments(rows)
+
+        with mock.patch.dict(bulk.IMPORTERS, comments=fail_on_reply):
+            with self.assertRaises(RuntimeError):
+                call_command(
+                    'import_content', self.directory, batch_size=1,
+                    stdout=StringIO()
+                )
+        path = os.path.join(self.directory, bulk.CHECKPOINT)
+        with open(path) as file:
+            self.assertEqual(
+                json.load(file), {'groups': 1, 'posts': 2, 'comments': 1}
+            )
+        self.assertEqual(Comment.objects.count(), 1)
+        import_posts = mock.Mock()
+        with mock.patch.dict(bulk.IMPORTERS, posts=import_posts):
+            call_command(
+                'import_content', self.directory, batch_size=1,
+                stdout=StringIO()
+            )
+        import_posts.assert_not_called()
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(
+            Comment.objects.get(pk=self.reply.pk).parent_id, self.comment.pk
+        )
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,73 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import AuthorStats, Comment, Follow, Post, User
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+
+    def assertStats(self, user, **expected):
+        stats = AuthorStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_posts_count(self):
+        '''Счётчик постов сдвигается при создании и удалении поста.'''
+        post = Post.objects.create(text='Пост', author=CountersTest.author)
+        self.assertStats(CountersTest.author, posts_count=1)
+        post.delete()
+        self.assertStats(CountersTest.author, posts_count=0)
+
+    def test_comments_count(self):
+        '''Счётчик комментариев сдвигается вместе с комментариями.'''
+        post = Post.objects.create(text='Пост', author=CountersTest.author)
+        comment = Comment.objects.create(
+            post=post, author=CountersTest.user, text='Комментарий'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counts(self):
+        '''Подписка сдвигает счётчики подписчиков и подписок.'''
+        Follow.objects.create(
+            user=CountersTest.user, author=CountersTest.author
+        )
+        self.assertStats(CountersTest.author, followers_count=1)
+        self.assertStats(CountersTest.user, following_count=1)
+        Follow.objects.filter(user=CountersTest.user).delete()
+        self.assertStats(CountersTest.author, followers_count=0)
+        self.assertStats(CountersTest.user, following_count=0)
+
+    def test_counter_never_negative(self):
+        '''Уменьшение не опускает счётчик ниже нуля.'''
+        post = Post.objects.create(text='Пост', author=CountersTest.author)
+        AuthorStats.objects.filter(user=CountersTest.author).update(
+            posts_count=0
+        )
+        post.delete()
+        self.assertStats(CountersTest.author, posts_count=0)
+
+    def test_reconcile_command(self):
+        '''Команда reconcile_counters исправляет расхождения.'''
+        post = Post.objects.create(text='Пост', author=CountersTest.author)
+        AuthorStats.objects.filter(user=CountersTest.author).update(
+            posts_count=42
+        )
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('пользователей 1, постов 1', out.getvalue())
+        self.assertStats(CountersTest.author, posts_count=1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
@@ -0,0 +1,105 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from .. import follows
+from ..models import AuthorStats, Follow, Post, TimelineEntry, User
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{num}')
+            for num in range(3)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_following_is_cached(self):
+        """Проверка подписки берёт множество авторов из кэша."""
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        self.assertEqual(
+            follows.following(self.reader.pk), {self.authors[0].pk}
+        )
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follows.is_following(self.reader, self.authors[0].pk)
+            )
+            self.assertFalse(
+                follows.is_following(self.reader, self.authors[1].pk)
+            )
+
+    def test_changes_reset_cache(self):
+        """Подписка и отписка сбрасывают кэш подписок."""
+        follows.following(self.reader.pk)
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        self.assertEqual(
+            follows.following(self.reader.pk), {self.authors[0].pk}
+        )
+        follows.follow_many(self.reader, [self.authors[1].pk])
+        self.assertEqual(
+            follows.following(self.reader.pk),
+            {self.authors[0].pk, self.authors[1].pk}
+        )
+        follows.unfollow_many(self.reader, [self.authors[0].pk])
+        self.assertEqual(
+            follows.following(self.reader.pk), {self.authors[1].pk}
+        )
+
+    def test_follow_many(self):
+        """follow_many создаёт только новые подписки и ленту."""
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        ids = [author.pk for author in self.authors]
+        new = follows.follow_many(self.reader, ids + [self.reader.pk, 0])
+        self.assertEqual(new, set(ids[1:]))
+        self.assertEqual(
+            set(Follow.objects.filter(user=self.reader).values_list(
+                'author_id', flat=True
+            )),
+            set(ids)
+        )
+        self.assertEqual(self.stats(self.reader).following_count, 3)
+        for author in self.authors:
+            self.assertEqual(self.stats(author).followers_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3
+        )
+        self.assertEqual(follows.follow_many(self.reader, ids), set())
+
+    def test_follow_many_shifts_counters(self):
+        """follow_many сдвигает счётчики, а не пересчитывает их."""
+        AuthorStats.objects.filter(user=self.authors[0]).update(
+            followers_count=100
+        )
+        follows.follow_many(self.reader, [self.authors[0].pk])
+        self.assertEqual(self.stats(self.authors[0]).followers_count, 101)
+
+    def test_unfollow_many(self):
+        """unfollow_many удаляет подписки, счётчики и записи ленты."""
+        ids = [author.pk for author in self.authors]
+        follows.follow_many(self.reader, ids)
+        self.assertEqual(follows.unfollow_many(self.reader, ids[:2]), 2)
+        self.assertEqual(follows.unfollow_many(self.reader, ids[:2]), 0)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.authors[0]).followers_count, 0)
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.reader
+            ).values_list('post__author_id', flat=True)),
+            [ids[2]]
+        )
+        author = User.objects.get(pk=ids[2])
+        self.assertEqual(follows.followers_count(author), 1)
+
+    def test_cannot_follow_self(self):
+        """На самого себя подписаться нельзя."""
+        self.assertFalse(follows.follow(self.reader, self.reader))
+        self.assertFalse(Follow.objects.exists())
@@ -0,0 +1,108 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+# Полный проход по таблице без индекса: «SCAN posts_post». Проход по
+# результату подзапроса с LIMIT («SCAN subquery») таблицу не читает.
+FULL_SCAN_RE = re.compile(r'^SCAN (?!subquery)\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class QueryPlanTest(TestCase):
+    '''Запросы страниц читают данные по индексам, без полного прохода
+    по таблицам и без сортировки во временном B-дереве.'''
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for num in range(15):
+            Post.objects.create(
+                text=f'Пост {num}', author=cls.author, group=cls.group
+            )
+        cls.post = Post.objects.latest()
+        for num in range(2):
+            comment = Comment.objects.create(
+                post=cls.post, author=cls.user, text='Комментарий'
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.user, parent=comment, text='Ответ'
+            )
+        cls.comment = comment
+
+    def setUp(self) -> None:
+        self.client = Client()
+        self.client.force_login(QueryPlanTest.user)
+        cache.clear()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedQueries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        for query in context.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            for step in self.explain(query['sql']):
+                with self.subTest(url=url, sql=query['sql'], step=step):
+                    self.assertNotRegex(step, FULL_SCAN_RE)
+                    self.assertNotIn(TEMP_SORT, step)
+
+    def test_pages_use_indexes(self):
+        '''Страницы лент, профиля и поста и их JSON-версии не сканируют
+        таблицы.'''
+        author = QueryPlanTest.author.username
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse(
+                'posts:group_list', kwargs={'slug': QueryPlanTest.group.slug}
+            ),
+            reverse('posts:profile', kwargs={'username': author}),
+            reverse(
+                'posts:post_detail', kwargs={'post_id': QueryPlanTest.post.pk}
+            ),
+            reverse(
+                'posts:post_comments',
+                kwargs={'post_id': QueryPlanTest.post.pk}
+            ),
+            reverse(
+                'posts:comment_replies',
+                kwargs={
+                    'post_id': QueryPlanTest.post.pk,
+                    'comment_id': QueryPlanTest.comment.pk,
+                }
+            ),
+            reverse('posts:follow_index'),
+            reverse('posts:api_index'),
+            reverse(
+                'posts:api_group_list',
+                kwargs={'slug': QueryPlanTest.group.slug}
+            ),
+            reverse('posts:api_profile', kwargs={'username': author}),
+            reverse(
+                'posts:api_post_detail',
+                kwargs={'post_id': QueryPlanTest.post.pk}
+            ),
+            reverse('posts:api_follow_index'),
+        ]
+        page = self.client.get(urls[0]).context['page_obj']
+        urls.append(f'{urls[0]}?cursor={page.next_cursor}')
+        for url in urls:
+            self.assertIndexedQueries(url)
@@ -0,0 +1,203 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Post, User
+from ..paginators import (
+    BACKWARD, FORWARD, CountedCursorPaginator, CursorPaginator,
+    decode_cursor, encode_cursor
+)
+from ..views import POSTS_AMOUNT
+
+POSTS_NUM = POSTS_AMOUNT * 2 + 3
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        Post.objects.bulk_create([
+            Post(text='Тестовый пост' + str(num), author=cls.author)
+            for num in range(POSTS_NUM)
+        ])
+        cls.all_posts = list(Post.objects.order_by('-created', '-id'))
+
+    def setUp(self) -> None:
+        self.client = Client()
+        self.paginator = CursorPaginator(Post.objects.all(), POSTS_AMOUNT)
+        cache.clear()
+
+    def test_cursor_roundtrip(self):
+        '''Токен курсора однозначно восстанавливает ключ поста.'''
+        post = CursorPaginatorTest.all_posts[0]
+        for direction in (FORWARD, BACKWARD):
+            with self.subTest(direction=direction):
+                self.assertEqual(
+                    decode_cursor(
+                        encode_cursor(direction, post.created, post.pk)
+                    ),
+                    (direction, post.created, post.pk)
+                )
+
+    def test_broken_cursor_returns_first_page(self):
+        '''Повреждённый токен отдаёт первую страницу.'''
+        for cursor in ('', 'мусор', 'bm9wZQ', '!!!'):
+            with self.subTest(cursor=cursor):
+                page = self.paginator.get_cursor_page(cursor)
+                self.assertEqual(
+                    page.object_list,
+                    CursorPaginatorTest.all_posts[:POSTS_AMOUNT]
+                )
+                self.assertIsNone(page.previous_cursor)
+
+    def test_cursor_key_out_of_range(self):
+        '''Токен с id вне 64-битного диапазона считается повреждённым.'''
+        post = CursorPaginatorTest.all_posts[0]
+        for key in (2 ** 63, -2 ** 63 - 1, 10 ** 20):
+            with self.subTest(key=key):
+                cursor = encode_cursor(FORWARD, post.created, key)
+                self.assertIsNone(decode_cursor(cursor))
+                page = self.paginator.get_cursor_page(cursor)
+                self.assertEqual(
+                    page.object_list,
+                    CursorPaginatorTest.all_posts[:POSTS_AMOUNT]
+                )
+
+    def test_huge_page_number(self):
+        '''Слишком большой номер страницы отдаёт первую страницу.'''
+        number = '9' * 20
+        self.assertEqual(
+            self.paginator.get_cursor_page(number=number).object_list,
+            CursorPaginatorTest.all_posts[:POSTS_AMOUNT]
+        )
+        post = CursorPaginatorTest.all_posts[0]
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=['author']),
+            reverse('posts:post_detail', args=[post.pk]),
+            reverse('posts:api_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, {'page': number})
+                self.assertEqual(response.status_code, 200)
+
+    def test_page_past_end_shows_last_page(self):
+        '''Номер страницы за концом ленты отдаёт последнюю страницу.'''
+        page = self.paginator.get_cursor_page(number='5')
+        self.assertEqual(page.number, 3)
+        self.assertEqual(
+            page.object_list,
+            CursorPaginatorTest.all_posts[POSTS_AMOUNT * 2:]
+        )
+        self.assertIsNone(page.next_cursor)
+
+    def test_walk_forward_and_back(self):
+        '''По токенам можно пройти ленту вперёд и назад.'''
+        pages = []
+        page = self.paginator.get_cursor_page()
+        while True:
+            pages.append(page.object_list)
+            if not page.next_cursor:
+                break
+            page = self.paginator.get_cursor_page(page.next_cursor)
+        self.assertEqual(
+            sum(pages, []), CursorPaginatorTest.all_posts
+        )
+        previous = self.paginator.get_cursor_page(page.previous_cursor)
+        self.assertEqual(previous.object_list, pages[-2])
+        self.assertIsNotNone(previous.next_cursor)
+
+    def test_legacy_page_number(self):
+        '''Старые ссылки ?page=N продолжают работать.'''
+        page = self.paginator.get_cursor_page(number='2')
+        self.assertEqual(
+            page.object_list,
+            CursorPaginatorTest.all_posts[POSTS_AMOUNT:POSTS_AMOUNT * 2]
+        )
+        self.assertIsNotNone(page.previous_cursor)
+        self.assertIsNotNone(page.next_cursor)
+
+    def test_no_count_query(self):
+        '''Страница по курсору не выполняет COUNT(*).'''
+        cursor = self.paginator.get_cursor_page().next_cursor
+        with self.assertNumQueries(1):
+            self.paginator.get_cursor_page(cursor)
+
+    def test_view_renders_cursor_links(self):
+        '''Шаблон пагинатора содержит ссылку на следующую страницу.'''
+        response = self.client.get(reverse('posts:index'))
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, f'?cursor={next_cursor}')
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': next_cursor}
+        )
+        self.assertEqual(
+            response.context['page_obj'].object_list,
+            CursorPaginatorTest.all_posts[POSTS_AMOUNT:POSTS_AMOUNT * 2]
+        )
+
+
+class CountedCursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        Post.objects.bulk_create([
+            Post(text='Тестовый пост' + str(num), author=cls.author)
+            for num in range(POSTS_NUM)
+        ])
+
+    def setUp(self) -> None:
+        self.client = Client()
+        cache.clear()
+
+    def paginator(self, per_page=POSTS_AMOUNT, **kwargs):
+        return CountedCursorPaginator(
+            Post.objects.all(), per_page, scopes=['feed'], **kwargs
+        )
+
+    def test_page_window(self):
+        """Номера страниц выводятся окном с пропусками."""
+        paginator = self.paginator(per_page=1)
+        self.assertEqual(
+            paginator.page_window(10), [1, None, 8, 9, 10, 11, 12, None, 23]
+        )
+        self.assertEqual(paginator.page_window(1), [1, 2, 3, None, 23])
+
+    def test_count_cached_until_feed_changes(self):
+        """Число постов считается один раз до создания нового поста."""
+        self.paginator().get_cursor_page()
+        with self.assertNumQueries(1):
+            page = self.paginator().get_cursor_page()
+        self.assertEqual(page.page_window, [1, 2, 3])
+        Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(self.paginator().count, POSTS_NUM + 1)
+
+    def test_known_count_not_queried(self):
+        with self.assertNumQueries(1):
+            page = self.paginator(count=POSTS_NUM).get_cursor_page()
+        self.assertEqual(page.page_window, [1, 2, 3])
+
+    @mock.patch('posts.paginators.COUNT_LIMIT', 5)
+    def test_count_estimated_over_limit(self):
+        """Сверх предела число постов оценивается снизу, последняя
+        страница не показывается."""
+        paginator = self.paginator(per_page=1)
+        self.assertEqual(paginator.count, 6)
+        self.assertTrue(paginator.count_is_estimate)
+        self.assertEqual(paginator.page_window(1), [1, 2, 3, None])
+
+    def test_view_renders_page_numbers(self):
+        """Лента выводит номера страниц и подписывает страницы по
+        курсору."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '?page=3')
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': next_cursor, 'page': 2}
+        )
+        self.assertEqual(response.context['page_obj'].number, 2)
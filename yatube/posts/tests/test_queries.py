@@ -0,0 +1,98 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from ..views import POSTS_AMOUNT
+
+AUTHORS_NUM = POSTS_AMOUNT
+
+
+class QueryBudgetTest(TestCase):
+    '''Число запросов к БД на странице не зависит от числа постов.'''
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        authors = [
+            User.objects.create(username=f'author{num}')
+            for num in range(AUTHORS_NUM)
+        ]
+        for author in authors:
+            Follow.objects.create(user=cls.user, author=author)
+            Post.objects.create(
+                text='Тестовый пост', author=author, group=cls.group
+            )
+        cls.post = Post.objects.latest()
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=author, text='Комментарий')
+            for author in authors
+        ])
+
+    def setUp(self) -> None:
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryBudgetTest.user)
+        cache.clear()
+
+    def assertQueryBudget(self, client, url, budget):
+        with self.subTest(url=url):
+            with self.assertNumQueries(budget):
+                client.get(url)
+
+    def test_guest_pages_budget(self):
+        '''Анонимные страницы укладываются в бюджет запросов.'''
+        budgets = {
+            reverse('posts:index'): 1,
+            reverse(
+                'posts:group_list', kwargs={'slug': QueryBudgetTest.group.slug}
+            ): 2,
+            reverse('posts:profile', kwargs={
+                'username': QueryBudgetTest.post.author.username
+            }): 2,
+            reverse('posts:post_detail', kwargs={
+                'post_id': QueryBudgetTest.post.pk
+            }): 3,
+            reverse('posts:post_comments', kwargs={
+                'post_id': QueryBudgetTest.post.pk
+            }): 3,
+        }
+        for url, budget in budgets.items():
+            self.assertQueryBudget(self.guest_client, url, budget)
+
+    def test_authorized_pages_budget(self):
+        '''Страницы авторизованного пользователя укладываются в бюджет:
+        два запроса уходят на сессию и пользователя. Подписки, прочитанные
+        лентой подписок, профиль берёт из кэша.'''
+        budgets = {
+            reverse('posts:index'): 3,
+            reverse('posts:follow_index'): 5,
+            reverse('posts:profile', kwargs={
+                'username': QueryBudgetTest.post.author.username
+            }): 4,
+        }
+        for url, budget in budgets.items():
+            self.assertQueryBudget(self.authorized_client, url, budget)
+
+    def test_profile_does_not_read_follows(self):
+        '''Профиль для авторизованного пользователя не читает Follow,
+        пока его подписки не менялись.'''
+        url = reverse('posts:profile', kwargs={
+            'username': QueryBudgetTest.post.author.username
+        })
+        self.authorized_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        self.assertTrue(response.context['following'])
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'posts_follow' in query['sql']
+        ])
@@ -0,0 +1,110 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post, SearchTerm, User
+from ..stemmer import stem
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_share_stem(self):
+        '''Формы одного слова сводятся к одной основе.'''
+        forms = {
+            'книга': ('книги', 'книгами', 'книге'),
+            'прекрасный': ('прекрасные', 'прекраснейший', 'прекрасного'),
+            'ёлка': ('елки', 'ёлками'),
+        }
+        for word, others in forms.items():
+            for other in others:
+                with self.subTest(word=word, other=other):
+                    self.assertEqual(stem(word), stem(other))
+
+    def test_latin_words_kept(self):
+        '''Слова не на кириллице только приводятся к нижнему регистру.'''
+        self.assertEqual(stem('Django'), 'django')
+
+
+class SearchTest(TestCase):
+    '''Поиск по индексу FTS5.'''
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+
+    def setUp(self) -> None:
+        self.books = Post.objects.create(
+            text='Читаю интересные книги по вечерам', author=self.author
+        )
+        self.cats = Post.objects.create(
+            text='Кошки спят, книга лежит', author=self.author
+        )
+        self.comment = Comment.objects.create(
+            post=self.cats, author=self.author, text='Интересная кошка'
+        )
+
+    def test_word_forms_found(self):
+        '''Пост находится по другой форме слова.'''
+        self.assertEqual(search.search('кошками'), [self.cats.pk])
+        self.assertCountEqual(
+            search.search('книгу'), [self.books.pk, self.cats.pk]
+        )
+
+    def test_all_words_required(self):
+        '''Находятся только посты, где есть все слова запроса.'''
+        self.assertEqual(search.search('книга вечер'), [self.books.pk])
+        self.assertEqual(search.search('книга собака'), [])
+
+    def test_post_text_ranked_above_comment(self):
+        '''Совпадение в тексте поста важнее совпадения в комментарии.'''
+        self.assertEqual(
+            search.search('интересный'), [self.books.pk, self.cats.pk]
+        )
+
+    def test_index_updated_on_edit_and_delete(self):
+        '''Индекс обновляется при изменении и удалении документов.'''
+        self.books.text = 'Смотрю фильмы по вечерам'
+        self.books.save()
+        self.assertEqual(search.search('фильм'), [self.books.pk])
+        self.assertEqual(search.search('книги'), [self.cats.pk])
+        self.comment.delete()
+        self.assertEqual(search.search('интересный'), [])
+        self.cats.delete()
+        self.assertEqual(search.search('кошка'), [])
+
+    def test_rebuild(self):
+        '''Команда перестраивает индекс по всем постам и комментариям.'''
+        search.get_index().clear()
+        self.assertEqual(search.search('кошка'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('3', out.getvalue())
+        self.assertEqual(search.search('кошка'), [self.cats.pk])
+
+    def test_search_page(self):
+        '''Страница поиска показывает найденные посты.'''
+        response = Client().get(reverse('posts:search'), {'q': 'кошки'})
+        self.assertEqual(response.context['query'], 'кошки')
+        self.assertEqual(list(response.context['page_obj']), [self.cats])
+        response = Client().get(reverse('posts:search'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+
+class TermIndexSearchTest(SearchTest):
+    '''Тот же поиск по запасному индексу в таблице SearchTerm.'''
+
+    def setUp(self) -> None:
+        patcher = mock.patch('posts.search.get_index', search.TermIndex)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+    def test_terms_stored(self):
+        '''Основы слов хранятся с частотами.'''
+        self.assertTrue(SearchTerm.objects.filter(
+            post=self.cats, comment=None, term='кошк', frequency=1
+        ).exists())
@@ -0,0 +1,145 @@
+import os
+import stat
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import snapshots
+from ..models import Follow, Group, Post, User
+
+
+class SnapshotsTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.bulk_create([
+            Post(author=cls.author, group=cls.group, text=f'Пост {num}')
+            for num in range(15)
+        ])
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Свежий пост'
+        )
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        settings = self.settings(SNAPSHOT_ROOT=self.root, SNAPSHOT_PAGES=3)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def read(self, *parts):
+        with open(os.path.join(self.root, *parts), encoding='utf-8') as file:
+            return file.read()
+
+    def test_publish_group_writes_first_pages(self):
+        """Копия группы состоит из первых страниц ленты."""
+        self.assertEqual(snapshots.publish_group(self.group.pk), 2)
+        first = self.read('group', 'group', 'index.html')
+        self.assertIn('Свежий пост', first)
+        self.assertIn('Группа', first)
+        self.assertIn('Пост 0', self.read('group', 'group', 'page-2.html'))
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.root, 'group', 'group'))),
+            ['index.html', 'page-2.html']
+        )
+
+    def test_publish_profile_is_anonymous(self):
+        """Копия профиля показывается гостю и доступна на чтение."""
+        self.assertEqual(snapshots.publish_profile(self.author.pk), 2)
+        page = self.read('profile', 'author', 'index.html')
+        self.assertIn('Свежий пост', page)
+        self.assertIn('Войти', page)
+        self.assertNotIn('Выйти', page)
+        mode = os.stat(
+            os.path.join(self.root, 'profile', 'author', 'index.html')
+        ).st_mode
+        self.assertEqual(stat.S_IMODE(mode), 0o644)
+
+    def test_stale_pages_removed(self):
+        """Лишние страницы удаляются при перестройке."""
+        snapshots.publish_group(self.group.pk)
+        Post.objects.filter(text__startswith='Пост').delete()
+        self.assertEqual(snapshots.publish_group(self.group.pk), 1)
+        self.assertEqual(
+            os.listdir(os.path.join(self.root, 'group', 'group')),
+            ['index.html']
+        )
+
+    def test_publish_snapshots_prunes_missing(self):
+        """Команда удаляет копии исчезнувших групп."""
+        os.makedirs(os.path.join(self.root, 'group', 'gone'))
+        call_command('publish_snapshots', stdout=mock.MagicMock())
+        self.assertEqual(os.listdir(os.path.join(self.root, 'group')), [
+            'group'
+        ])
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.root, 'profile'))),
+            ['author', 'reader']
+        )
+
+    def test_group_delete_removes_snapshots(self):
+        """Удаление группы удаляет её копию."""
+        snapshots.publish_group(self.group.pk)
+        Group.objects.get(pk=self.group.pk).delete()
+        self.assertFalse(
+            os.path.exists(os.path.join(self.root, 'group', 'group'))
+        )
+
+    def test_rename_removes_old_snapshots(self):
+        """Переименование группы и пользователя удаляет старые копии."""
+        snapshots.publish_group(self.group.pk)
+        snapshots.publish_profile(self.author.pk)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'writer'
+        with self.scheduled() as publish:
+            group.save()
+            author.save()
+        self.assertEqual(os.listdir(os.path.join(self.root, 'group')), [])
+        self.assertEqual(os.listdir(os.path.join(self.root, 'profile')), [])
+        publish['publish_group'].delay.assert_called_once_with(group.pk)
+        publish['publish_profile'].delay.assert_called_once_with(author.pk)
+
+    def scheduled(self):
+        return mock.patch.multiple(
+            'posts.snapshots',
+            publish_group=mock.DEFAULT, publish_profile=mock.DEFAULT,
+        )
+
+    def test_changes_schedule_rebuild(self):
+        """Посты и подписки ставят перестройку копий в очередь."""
+        with self.scheduled() as publish:
+            post = Post.objects.create(author=self.reader, text='Новый')
+        publish['publish_group'].delay.assert_not_called()
+        publish['publish_profile'].delay.assert_called_once_with(
+            self.reader.pk
+        )
+        with self.scheduled() as publish:
+            post.group = self.group
+            post.save()
+        publish['publish_group'].delay.assert_called_once_with(self.group.pk)
+        publish['publish_profile'].delay.assert_called_once_with(
+            self.reader.pk
+        )
+        with self.scheduled() as publish:
+            Follow.objects.create(user=self.reader, author=self.author)
+        delay = publish['publish_profile'].delay
+        self.assertEqual(
+            {call.args for call in delay.mock_calls},
+            {(self.reader.pk,), (self.author.pk,)}
+        )
+
+    def test_disabled_without_root(self):
+        """Без SNAPSHOT_ROOT копии не перестраиваются."""
+        with self.settings(SNAPSHOT_ROOT=None), self.scheduled() as publish:
+            Post.objects.create(author=self.reader, text='Новый')
+        publish['publish_profile'].delay.assert_not_called()
@@ -0,0 +1,159 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail.images import ImageFile
+
+from ..models import Post, User
+from ..thumbnails import (
+    POST_THUMBNAILS, AsyncThumbnailBackend, Placeholder, generate
+)
+from ..variants import WIDTHS, available_formats, generate_variants
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class AsyncThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='noname')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.backend = AsyncThumbnailBackend()
+        self.geometry, self.options = POST_THUMBNAILS[0]
+        with mock.patch('posts.thumbnails.schedule_post'):
+            self.post = Post.objects.create(
+                text='Пост с картинкой',
+                author=AsyncThumbnailTest.user,
+                image=SimpleUploadedFile(
+                    name='small.gif', content=SMALL_GIF,
+                    content_type='image/gif'
+                ),
+            )
+
+    def test_missing_thumbnail_is_scheduled(self):
+        '''Отсутствующая миниатюра не строится в запросе.'''
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            thumbnail = self.backend.get_thumbnail(
+                self.post.image, self.geometry, **self.options
+            )
+        self.assertIsInstance(thumbnail, Placeholder)
+        schedule.assert_called_once_with(
+            self.post.image.name, self.geometry, self.options
+        )
+
+    def test_generated_thumbnail_is_served(self):
+        '''Построенная в фоне миниатюра отдаётся без постановки в очередь.'''
+        generate(self.post.image.name, self.geometry, dict(self.options))
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            thumbnail = self.backend.get_thumbnail(
+                self.post.image, self.geometry, **self.options
+            )
+        self.assertIsInstance(thumbnail, ImageFile)
+        self.assertTrue(thumbnail.exists())
+        schedule.assert_not_called()
+
+    def test_new_image_scheduled_on_save(self):
+        '''Смена картинки ставит её миниатюры в очередь.'''
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            self.post.text = 'Новый текст'
+            self.post.save()
+            schedule.assert_not_called()
+            self.post.image = SimpleUploadedFile(
+                name='other.gif', content=SMALL_GIF, content_type='image/gif'
+            )
+            self.post.save()
+        schedule.assert_called_once_with(
+            self.post.image.name, self.geometry, self.options
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantsTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='noname')
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 600), 'red').save(buffer, 'JPEG')
+        with mock.patch('posts.thumbnails.schedule_post'):
+            cls.post = Post.objects.create(
+                text='Пост с большой картинкой',
+                author=cls.user,
+                image=SimpleUploadedFile(
+                    name='big.jpg', content=buffer.getvalue(),
+                    content_type='image/jpeg'
+                ),
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_variants_built_for_every_format_and_width(self):
+        '''Для каждого доступного формата строятся все ширины.'''
+        generate_variants(ImageVariantsTest.post.image.name)
+        ImageVariantsTest.post.refresh_from_db()
+        sources = ImageVariantsTest.post.picture_sources
+        self.assertEqual(
+            [source['type'] for source in sources],
+            [mime for _, _, mime in available_formats()]
+        )
+        self.assertEqual(sources[-1]['type'], 'image/jpeg')
+        for width in WIDTHS:
+            with self.subTest(width=width):
+                self.assertIn(f'-{width}w.jpg {width}w', sources[-1]['srcset'])
+        with Image.open(
+            f'{TEMP_MEDIA_ROOT}/posts/variants/'
+            f'{sources[-1]["src"].rsplit("/", 1)[-1]}'
+        ) as variant:
+            self.assertEqual(variant.size, (960, 339))
+
+    def test_picture_rendered_with_srcset(self):
+        '''Страница поста выводит <picture> со srcset.'''
+        generate_variants(ImageVariantsTest.post.image.name)
+        response = Client().get(reverse(
+            'posts:post_detail',
+            kwargs={'post_id': ImageVariantsTest.post.pk}
+        ))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'srcset=')
+
+    def test_image_change_resets_variants(self):
+        '''Новая картинка сбрасывает список вариантов.'''
+        generate_variants(ImageVariantsTest.post.image.name)
+        post = Post.objects.get(pk=ImageVariantsTest.post.pk)
+        post.image = SimpleUploadedFile(
+            name='other.gif', content=SMALL_GIF, content_type='image/gif'
+        )
+        with mock.patch('posts.thumbnails.schedule_post'):
+            post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.picture_sources, [])
@@ -0,0 +1,137 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from core import tasks
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, User
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.star = User.objects.create(username='star')
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author
+        )
+
+    def setUp(self) -> None:
+        self.authorized_client = Client()
+        self.authorized_client.force_login(TimelineTest.reader)
+        cache.clear()
+
+    def follow(self, author):
+        return self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': author.username}
+        ))
+
+    def timeline(self):
+        return TimelineEntry.objects.filter(
+            user=TimelineTest.reader
+        ).values_list('post_id', flat=True)
+
+    def test_follow_backfills_timeline(self):
+        '''Подписка добавляет в ленту уже опубликованные посты автора.'''
+        self.follow(TimelineTest.author)
+        self.assertIn(TimelineTest.old_post.pk, self.timeline())
+
+    @mock.patch('posts.timeline.BACKFILL_POSTS_LIMIT', 1)
+    def test_backfill_many(self):
+        '''Пачка подписок получает последние посты каждого автора
+        одним запросом к постам.'''
+        star_post = Post.objects.create(
+            text='Пост звезды', author=TimelineTest.star
+        )
+        new_post = Post.objects.create(
+            text='Новый пост', author=TimelineTest.author
+        )
+        follows = [
+            Follow(user=TimelineTest.reader, author=TimelineTest.author),
+            Follow(user=TimelineTest.reader, author=TimelineTest.star),
+        ]
+        with self.assertNumQueries(3):
+            timeline.backfill_many(follows)
+        self.assertEqual(
+            set(self.timeline()), {star_post.pk, new_post.pk}
+        )
+
+    def test_new_post_fanned_out(self):
+        '''Новый пост попадает в ленты подписчиков при записи.'''
+        self.follow(TimelineTest.author)
+        post = Post.objects.create(
+            text='Новый пост', author=TimelineTest.author
+        )
+        self.assertIn(post.pk, self.timeline())
+
+    def test_unfollow_purges_timeline(self):
+        '''Отписка убирает посты автора из ленты.'''
+        self.follow(TimelineTest.author)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': TimelineTest.author.username}
+        ))
+        self.assertFalse(self.timeline().exists())
+
+    @mock.patch('posts.timeline.FANOUT_FOLLOWERS_LIMIT', 1)
+    def test_author_below_limit_refilled(self):
+        '''Когда автор опускается до порога рассылки, его посты
+        попадают в ленты подписчиков.'''
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.star
+        )
+        Follow.objects.create(
+            user=TimelineTest.author, author=TimelineTest.star
+        )
+        star_post = Post.objects.create(
+            text='Пост звезды', author=TimelineTest.star
+        )
+        self.assertNotIn(star_post.pk, self.timeline())
+        Follow.objects.filter(
+            user=TimelineTest.author, author=TimelineTest.star
+        ).delete()
+        self.assertEqual(tasks.run_pending(), 1)
+        self.assertIn(star_post.pk, self.timeline())
+
+    @mock.patch('posts.timeline.FANOUT_FOLLOWERS_LIMIT', 1)
+    def test_hybrid_authors_cached(self):
+        '''Список авторов без рассылки берётся из кэша и сбрасывается,
+        когда автор переходит порог.'''
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.star
+        )
+        self.assertEqual(timeline.hybrid_authors(TimelineTest.reader), [])
+        with self.assertNumQueries(0):
+            timeline.hybrid_authors(TimelineTest.reader)
+        Follow.objects.create(
+            user=TimelineTest.author, author=TimelineTest.star
+        )
+        self.assertEqual(
+            timeline.hybrid_authors(TimelineTest.reader),
+            [TimelineTest.star.pk]
+        )
+        Follow.objects.filter(user=TimelineTest.author).delete()
+        self.assertEqual(timeline.hybrid_authors(TimelineTest.reader), [])
+
+    @mock.patch('posts.timeline.FANOUT_FOLLOWERS_LIMIT', 0)
+    def test_hybrid_author_merged_on_read(self):
+        '''Посты популярного автора подмешиваются в ленту при чтении.'''
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.star
+        )
+        star_post = Post.objects.create(
+            text='Пост звезды', author=TimelineTest.star
+        )
+        self.assertNotIn(star_post.pk, self.timeline())
+        with mock.patch('posts.timeline.FANOUT_FOLLOWERS_LIMIT', 1):
+            self.follow(TimelineTest.author)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            response.context['page_obj'].object_list,
+            [star_post, TimelineTest.old_post]
+        )
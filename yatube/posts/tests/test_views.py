@@ -2,9 +2,10 @@ from django.core.cache import cache
 from django import forms
 from django.test import TestCase, Client
 from django.urls import reverse
-from ..models import Follow, Post, Group, User
+from ..models import Comment, Follow, Post, Group, User
 from ..forms import PostForm, CommentForm
-from ..views import POSTS_AMOUNT
+from ..threads import THREAD_DEPTH
+from ..views import COMMENTS_AMOUNT, POSTS_AMOUNT
 
 ADDITIONAL_POSTS_AMOUNT = 1
 POSTS_NUM = POSTS_AMOUNT + ADDITIONAL_POSTS_AMOUNT
@@ -169,7 +170,7 @@ class PostPagesTest(TestCase):
                     with self.subTest(key=key):
                         response = self.authorized_client.get(reverse_name)
                         self.assertIn(key, response.context)
-                        if key == 'page_obj':
+                        if key in ('page_obj', 'comments'):
                             self.assertEqual(
                                 response.context[key].object_list,
                                 expected_context
@@ -313,15 +314,285 @@ class PostPagesTest(TestCase):
         response = authorized_user.get(reverse_name)
         self.assertNotIn(author_post, response.context['page_obj'])
 
-    def test_cache(self):
-        """Тест работы кэша."""
+    def test_post_card_cache(self):
+        """Карточка поста кэшируется до изменения поста."""
+        post = Post.objects.create(
+            text='исходный текст', author=PostPagesTest.user
+        )
+        self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=post.pk).update(text='тихая правка')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'исходный текст')
+        self.assertNotContains(response, 'тихая правка')
+        post.text = 'новый текст'
+        post.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'новый текст')
+
+    def test_post_card_cache_shared_between_feeds(self):
+        """Карточка, отрисованная в одной ленте, берётся из кэша в другой."""
+        self.authorized_client.get(reverse(
+            'posts:profile', kwargs={'username': PostPagesTest.user.username}
+        ))
+        Post.objects.filter(pk=PostPagesTest.post.pk).update(
+            text='тихая правка'
+        )
+        response = self.authorized_client.get(reverse(
+            'posts:group_list', kwargs={'slug': PostPagesTest.group.slug}
+        ))
+        self.assertNotContains(response, 'тихая правка')
+
+    def test_deleted_post_not_shown(self):
+        """Удалённый пост сразу пропадает с главной страницы."""
         post = Post.objects.create(text='пост', author=PostPagesTest.user)
         response = self.authorized_client.get(reverse('posts:index'))
-        cached_content = response.content
-        self.assertEqual(response.content, cached_content)
+        self.assertIn(post, response.context['page_obj'])
         post.delete()
         response = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response.content, cached_content)
+        self.assertNotIn(post, response.context['page_obj'])
+
+    def test_header_rendered_per_user(self):
+        """Шапка страницы не кэшируется вместе с карточками."""
+        self.authorized_client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, reverse('posts:post_create'))
+
+    def test_feed_cache_invalidated_on_group_change(self):
+        """Смена группы поста сразу отражается в закэшированных лентах."""
+        post = Post.objects.create(
+            text='пост', author=PostPagesTest.user, group=PostPagesTest.group
+        )
+        old_group_url = reverse(
+            'posts:group_list', kwargs={'slug': PostPagesTest.group.slug}
+        )
+        new_group_url = reverse(
+            'posts:group_list',
+            kwargs={'slug': PostPagesTest.another_group.slug}
+        )
+        self.authorized_client.get(old_group_url)
+        self.authorized_client.get(new_group_url)
+        post.group = PostPagesTest.another_group
+        post.save()
+        response = self.authorized_client.get(old_group_url)
+        self.assertNotIn(post, response.context['page_obj'])
+        response = self.authorized_client.get(new_group_url)
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_post_detail_cache(self):
+        """Страница поста берётся из кэша без запросов к базе и
+        сбрасывается правкой поста и новым комментарием."""
+        post = Post.objects.create(
+            text='исходный текст', author=PostPagesTest.user
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'исходный текст')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'новый текст'}
+        )
+        self.assertContains(self.client.get(url), 'новый текст')
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'свежий комментарий'}
+        )
+        self.assertContains(self.client.get(url), 'свежий комментарий')
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='commenter')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        for num in range(COMMENTS_AMOUNT + 1):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {num}'
+            )
+        cls.comments = list(cls.post.comments.order_by('-created', '-id'))
+
+    def test_first_page_on_post_detail(self):
+        """На странице поста выводится первая страница комментариев."""
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        ))
+        page = response.context['comments']
+        self.assertEqual(
+            page.object_list, self.comments[:COMMENTS_AMOUNT]
+        )
+        self.assertContains(response, 'data-comments-more')
+
+    def test_next_page_fragment(self):
+        """Следующая страница отдаётся фрагментом без ссылки дальше."""
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        ))
+        cursor = response.context['comments'].next_cursor
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': cursor}
+        )
+        self.assertTemplateUsed(
+            response, 'posts/includes/comment_list.html'
+        )
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            response.context['comments'].object_list,
+            self.comments[COMMENTS_AMOUNT:]
+        )
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_fragment_for_missing_post(self):
+        """Для несуществующего поста фрагмент отвечает 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentThreadsTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='commenter')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        cls.root = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Корень'
+        )
+
+    def setUp(self) -> None:
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def reply(self, parent, text='Ответ'):
+        return Comment.objects.create(
+            post=self.post, author=self.user, parent=parent, text=text
+        )
+
+    def test_reply_via_add_comment(self):
+        """Ответ сохраняется с родителем, глубиной и путём ветки."""
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Ответ', 'parent': self.root.pk}
+        )
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.parent, self.root)
+        self.assertEqual(reply.depth, 1)
+        self.assertTrue(reply.path.startswith(self.root.path))
+
+    def test_parent_from_other_post_rejected(self):
+        """Нельзя ответить на комментарий к другому посту."""
+        other = Post.objects.create(text='Другой пост', author=self.user)
+        response = self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': other.pk}),
+            {'text': 'Ответ', 'parent': self.root.pk}
+        )
+        self.assertRedirects(response, reverse(
+            'posts:post_detail', kwargs={'post_id': other.pk}
+        ))
+        self.assertFalse(Comment.objects.filter(text='Ответ').exists())
+
+    def test_reply_form_rendered(self):
+        """Под комментарием выводится форма ответа со скрытым parent."""
+        response = self.authorized_client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        ))
+        self.assertContains(
+            response,
+            f'<input type="hidden" name="parent" value="{self.root.pk}">',
+            html=True
+        )
+        self.assertEqual(
+            len(response.context['comments_form'].fields), 1
+        )
+
+    def test_thread_rendered_in_order(self):
+        """Ветка выводится под корнем в порядке обхода дерева."""
+        first = self.reply(self.root, 'Первый')
+        second = self.reply(self.root, 'Второй')
+        nested = self.reply(first, 'Вложенный')
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        ))
+        root = response.context['comments'].object_list[0]
+        self.assertEqual(root.shown_replies, [first, nested, second])
+
+    def test_deep_thread_loaded_on_demand(self):
+        """Ответы глубже THREAD_DEPTH подгружаются фрагментом."""
+        parent = self.root
+        chain = []
+        for level in range(THREAD_DEPTH + 2):
+            parent = self.reply(parent, f'Уровень {level + 1}')
+            chain.append(parent)
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        ))
+        root = response.context['comments'].object_list[0]
+        self.assertEqual(root.shown_replies, chain[:THREAD_DEPTH])
+        self.assertTrue(root.shown_replies[-1].has_hidden_replies)
+        response = self.client.get(reverse(
+            'posts:comment_replies',
+            kwargs={
+                'post_id': self.post.pk,
+                'comment_id': chain[THREAD_DEPTH - 1].pk
+            }
+        ))
+        self.assertEqual(
+            response.context['replies'], chain[THREAD_DEPTH:]
+        )
+
+
+class FeedFragmentTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for num in range(POSTS_AMOUNT + 1):
+            Post.objects.create(
+                text=f'Пост {num}', author=cls.author, group=cls.group
+            )
+        cls.oldest = Post.objects.earliest()
+
+    def setUp(self) -> None:
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedFragmentTest.user)
         cache.clear()
-        response = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotEqual(response.content, cached_content)
+
+    def test_fragments_append_next_page(self):
+        """Фрагмент ленты отдаёт только карточки следующей страницы."""
+        feeds = {
+            'posts:index': [],
+            'posts:group_list': [self.group.slug],
+            'posts:profile': [self.author.username],
+            'posts:follow_index': [],
+        }
+        for name, args in feeds.items():
+            with self.subTest(feed=name):
+                response = self.authorized_client.get(
+                    reverse(name, args=args)
+                )
+                fragment_url = reverse(f'{name}_fragment', args=args)
+                cursor = response.context['page_obj'].next_cursor
+                self.assertContains(
+                    response, f'{fragment_url}?cursor={cursor}'
+                )
+                response = self.authorized_client.get(
+                    fragment_url, {'cursor': cursor}
+                )
+                self.assertTemplateUsed(
+                    response, 'posts/includes/post_feed.html'
+                )
+                self.assertTemplateNotUsed(response, 'base.html')
+                self.assertEqual(
+                    list(response.context['page_obj']), [self.oldest]
+                )
+                self.assertNotContains(response, 'data-feed-more')
+
+    def test_follow_fragment_requires_login(self):
+        response = self.client.get(reverse('posts:follow_index_fragment'))
+        self.assertEqual(response.status_code, 302)
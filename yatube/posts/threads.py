@@ -0,0 +1,56 @@
+'''Ветки ответов на комментарии.
+
+Путь комментария (Comment.path) — цепочка id предков в base36
+фиксированной ширины, поэтому ветка под комментарием — это диапазон
+путей (path, path + END), который читается по индексу одним запросом.
+Глубокие ветки подгружаются по частям фрагментом comment_replies.
+'''
+from django.db.models import Q
+
+from .models import Comment
+
+# Сколько уровней ответов выводится вместе с комментарием.
+THREAD_DEPTH = 3
+# Символ больше любой цифры base36: граница диапазона ветки.
+END = '~'
+
+
+def load_replies(roots, depth=THREAD_DEPTH):
+    '''Подгружает ответы на комментарии roots одним запросом.
+
+    Каждый комментарий из roots получает список shown_replies в порядке
+    вывода, до depth уровней вглубь. У ответов последнего уровня, под
+    которыми есть невыведенные ответы, выставляется has_hidden_replies.
+    '''
+    roots = list(roots)
+    for root in roots:
+        root.shown_replies = []
+    if not roots:
+        return
+    ranges = Q()
+    for root in roots:
+        ranges |= Q(
+            path__gt=root.path,
+            path__lt=root.path + END,
+            depth__lte=root.depth + depth + 1,
+        )
+    # Выборка ограничена глубиной, поэтому сортируется в Python, а не
+    # временным B-деревом в базе.
+    replies = sorted(
+        Comment.objects.filter(ranges).select_related('author').order_by(),
+        key=lambda reply: reply.path
+    )
+    by_path = {root.path: root for root in roots}
+    lengths = {len(path) for path in by_path}
+    nodes = {root.pk: root for root in roots}
+    for reply in replies:
+        root = next(
+            by_path[reply.path[:length]] for length in lengths
+            if reply.path[:length] in by_path
+        )
+        if reply.depth > root.depth + depth:
+            nodes[reply.parent_id].has_hidden_replies = True
+            continue
+        reply.has_hidden_replies = False
+        nodes[reply.pk] = reply
+        root.shown_replies.append(reply)
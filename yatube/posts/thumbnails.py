@@ -0,0 +1,87 @@
+'''Фоновая генерация миниатюр для картинок постов.
+
+Бэкенд подключается через THUMBNAIL_BACKEND и не строит миниатюры во
+время запроса: готовая миниатюра берётся из хранилища ключей sorl,
+отсутствующая ставится в фоновую очередь core.tasks, а шаблон
+получает заглушку. Миниатюры и адаптивные варианты (posts.variants) новых
+картинок строятся сразу после сохранения поста.
+'''
+from django.templatetags.static import static
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+from core import cache
+from core.tasks import task
+
+from . import variants
+from .models import Post
+
+PLACEHOLDER = 'img/placeholder.svg'
+# Миниатюры, которые шаблоны постов запрашивают у {% thumbnail %}.
+POST_THUMBNAILS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+
+class Placeholder(DummyImageFile):
+    '''Заглушка на время фоновой генерации миниатюры.'''
+
+    @property
+    def url(self):
+        return static(PLACEHOLDER)
+
+
+class AsyncThumbnailBackend(ThumbnailBackend):
+    def lookup(self, file_, geometry_string, **options):
+        '''Возвращает готовую миниатюру или None, ничего не создавая.'''
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        '''Отсутствующую миниатюру ставит в очередь прямо во время
+        отрисовки: GET-запрос проверяет и создаёт строку Task в основной
+        базе. Миниатюры постов ставятся заранее, при сохранении поста,
+        так что здесь остаются только потерянные или новые размеры.'''
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        thumbnail = self.lookup(file_, geometry_string, **options)
+        if thumbnail:
+            return thumbnail
+        schedule(str(file_), geometry_string, options)
+        return Placeholder(geometry_string)
+
+
+@task(unique=True, retry_failed=False)
+def generate(name, geometry_string, options):
+    '''Строит миниатюру и сбрасывает кэш постов с этой картинкой.'''
+    ThumbnailBackend().get_thumbnail(name, geometry_string, **options)
+    cache.bump(*(
+        cache.scope('post', pk)
+        for pk in Post.objects.filter(image=name).values_list(
+            'pk', flat=True
+        )
+    ))
+
+
+def schedule(name, geometry_string, options):
+    '''Ставит миниатюру в очередь фоновой генерации.'''
+    generate.delay(name, geometry_string, options)
+
+
+def schedule_post(post):
+    '''Ставит в очередь миниатюры и адаптивные варианты картинки.'''
+    for geometry_string, options in POST_THUMBNAILS:
+        schedule(post.image.name, geometry_string, dict(options))
+    variants.generate_variants.delay(post.image.name)
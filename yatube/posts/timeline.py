@@ -0,0 +1,243 @@
+'''Материализованные ленты подписок (fan-out при записи).
+
+Новый пост раскладывается в ленты подписчиков автора, подписка
+добавляет в ленту последние посты автора, отписка их убирает. Для
+авторов с очень большим числом подписчиков рассылка не делается:
+их посты подмешиваются в ленту при чтении. Когда такой автор
+опускается до порога, фоновая задача refill раскладывает его последние
+посты по лентам всех подписчиков: иначе посты, написанные без рассылки,
+и подписки того времени остались бы без записей в лентах.
+
+Список таких авторов в подписках пользователя кэшируется до сброса его
+области 'follows' или общей области 'hybrid', которая сбрасывается,
+когда любой автор переходит порог.
+'''
+from collections import defaultdict
+
+from django.db.models import OuterRef, Subquery
+
+from core import cache
+from core.cache import scope
+from core.tasks import task
+
+from .models import (
+    FEED_DEFERRED_FIELDS, AuthorStats, Follow, Post, TimelineEntry
+)
+from .paginators import FORWARD, CursorPaginator, paginate
+
+FANOUT_FOLLOWERS_LIMIT = 1000
+BACKFILL_POSTS_LIMIT = 200
+BATCH_SIZE = 500
+HYBRID_SCOPE = 'hybrid'
+
+
+def is_hybrid_author(author_id):
+    '''Посты автора читаются при чтении ленты, а не рассылаются.'''
+    return AuthorStats.objects.filter(
+        user_id=author_id, followers_count__gt=FANOUT_FOLLOWERS_LIMIT
+    ).exists()
+
+
+def hybrid_authors(user):
+    '''Авторы из подписок пользователя, не попадающие в его ленту.'''
+    return cache.get_or_set(
+        cache.make_key(
+            'hybrid_authors', [scope('follows', user.pk), HYBRID_SCOPE]
+        ),
+        lambda: list(Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gt=FANOUT_FOLLOWERS_LIMIT
+        ).values_list('author_id', flat=True))
+    )
+
+
+def fan_out_post(post):
+    '''Раскладывает новый пост по лентам подписчиков автора.'''
+    if is_hybrid_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, created=post.created)
+            for user_id in followers
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_posts(posts):
+    '''Раскладывает пачку постов по лентам подписчиков их авторов.'''
+    authors = {post.author_id for post in posts}
+    authors -= set(AuthorStats.objects.filter(
+        user_id__in=authors, followers_count__gt=FANOUT_FOLLOWERS_LIMIT
+    ).values_list('user_id', flat=True))
+    followers = defaultdict(list)
+    for user_id, author_id in Follow.objects.filter(
+        author_id__in=authors
+    ).values_list('user_id', 'author_id'):
+        followers[author_id].append(user_id)
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, created=post.created)
+            for post in posts
+            for user_id in followers[post.author_id]
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(follow):
+    '''Добавляет в ленту подписчика последние посты автора.'''
+    backfill_many([follow])
+
+
+def backfill_many(follows):
+    '''Добавляет в ленты подписчиков последние посты их авторов.
+
+    Посты всех авторов пачки выбираются одним запросом, записи лент
+    вставляются одним bulk_create.
+    '''
+    authors = {follow.author_id for follow in follows}
+    authors -= set(AuthorStats.objects.filter(
+        user_id__in=authors, followers_count__gt=FANOUT_FOLLOWERS_LIMIT
+    ).values_list('user_id', flat=True))
+    if not authors:
+        return
+    latest = Post.objects.filter(
+        author_id=OuterRef('author_id')
+    ).values('pk')[:BACKFILL_POSTS_LIMIT]
+    posts = defaultdict(list)
+    for post_id, author_id, created in Post.objects.filter(
+        author_id__in=authors, pk__in=Subquery(latest)
+    ).values_list('id', 'author_id', 'created'):
+        posts[author_id].append((post_id, created))
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=follow.user_id, post_id=post_id, created=created
+            )
+            for follow in follows
+            for post_id, created in posts[follow.author_id]
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def followers_changed(deltas):
+    '''Проверяет, не перешли ли авторы порог рассылки.
+
+    deltas — {id автора: на сколько уже изменилось число подписчиков}.
+    Переход порога сбрасывает кэш списков авторов без рассылки, а автор,
+    опустившийся до порога, получает refill.
+    '''
+    crossed = False
+    for author_id, count in AuthorStats.objects.filter(
+        user_id__in=deltas
+    ).values_list('user_id', 'followers_count'):
+        before = count - deltas[author_id]
+        if (before > FANOUT_FOLLOWERS_LIMIT) != (
+            count > FANOUT_FOLLOWERS_LIMIT
+        ):
+            crossed = True
+            if count <= FANOUT_FOLLOWERS_LIMIT:
+                refill.delay(author_id)
+    if crossed:
+        cache.bump(HYBRID_SCOPE)
+
+
+@task(unique=True)
+def refill(author_id):
+    '''Добавляет последние посты автора в ленты всех его подписчиков.'''
+    if is_hybrid_author(author_id):
+        return
+    follows = Follow.objects.filter(author_id=author_id).only(
+        'user_id', 'author_id'
+    )
+    batch = []
+    for follow in follows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(follow)
+        if len(batch) == BATCH_SIZE:
+            backfill_many(batch)
+            batch = []
+    backfill_many(batch)
+    cache.bump(*(
+        scope('timeline', user_id)
+        for user_id in follows.values_list('user_id', flat=True)
+    ))
+
+
+def purge(follow):
+    '''Убирает из ленты посты автора, от которого отписались.'''
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id
+    ).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    '''Постраничное чтение ленты подписок.
+
+    Страница собирается из записей ленты и постов авторов без рассылки;
+    оба потока упорядочены по (created, id) и сливаются в памяти.
+    '''
+    key_field = 'post_id'
+
+    def __init__(self, object_list, per_page, hybrid_posts=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.hybrid_posts = hybrid_posts
+        if hybrid_posts is not None:
+            self.hybrid_posts = hybrid_posts.order_by('-created', '-id')
+
+    def _in_bulk(self, ids):
+        return Post.objects.for_feed().in_bulk(ids)
+
+    def _entry_post(self, entry):
+        return entry.post
+
+    def _rows(self, direction, seek, limit, offset=0):
+        if self.hybrid_posts is None:
+            return [
+                self._entry_post(entry) for entry in self._select(
+                    self.object_list, self.key_field, direction, seek,
+                    limit, offset
+                )
+            ]
+        posts = [
+            self._entry_post(entry) for entry in self._select(
+                self.object_list, self.key_field, direction, seek,
+                offset + limit
+            )
+        ]
+        posts += self._select(
+            self.hybrid_posts, 'id', direction, seek, offset + limit
+        )
+        # Пост мог попасть в ленту до того, как автор перешёл порог
+        # рассылки, поэтому дубли по id схлопываются.
+        posts = sorted(
+            {self._key(post)[1]: post for post in posts}.values(),
+            key=self._key,
+            reverse=direction == FORWARD,
+        )
+        return posts[offset:offset + limit]
+
+
+def get_timeline_page(request, user, per_page):
+    '''Возвращает страницу ленты подписок пользователя.'''
+    entries = TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    ).defer(*(f'post__{field}' for field in FEED_DEFERRED_FIELDS))
+    hybrid_posts = None
+    authors = hybrid_authors(user)
+    if authors:
+        hybrid_posts = Post.objects.for_feed().filter(author_id__in=authors)
+    return paginate(
+        request, entries, per_page,
+        scopes=['feed', scope('timeline', user.pk)],
+        paginator_class=TimelinePaginator,
+        hybrid_posts=hybrid_posts,
+    )
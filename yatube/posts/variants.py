@@ -0,0 +1,87 @@
+'''Адаптивные варианты картинок постов.
+
+Для каждой загруженной картинки в фоне строится несколько ширин в
+каждом формате, который умеет кодировать установленный Pillow
+(AVIF и WebP при наличии кодеков, JPEG всегда). Список вариантов
+сохраняется в Post.image_variants и выводится в <picture> со srcset.
+'''
+import json
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from core import cache
+from core.tasks import task
+
+from . import snapshots
+from .models import Post
+
+WIDTHS = (320, 640, 960)
+ASPECT = (960, 339)
+QUALITY = 80
+VARIANTS_DIR = 'posts/variants'
+# Порядок важен: браузер берёт первый поддерживаемый <source>.
+FORMATS = (
+    ('AVIF', 'avif', 'image/avif'),
+    ('WEBP', 'webp', 'image/webp'),
+    ('JPEG', 'jpg', 'image/jpeg'),
+)
+
+
+def available_formats():
+    Image.init()
+    return [fmt for fmt in FORMATS if fmt[0] in Image.SAVE]
+
+
+def _widths(source_width):
+    widths = [width for width in WIDTHS if width <= source_width]
+    return widths or [WIDTHS[0]]
+
+
+def _save(name, content):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(content))
+
+
+def build_variants(name):
+    '''Строит варианты картинки name и возвращает их список.
+
+    Каждый элемент списка — {'type': mime, 'files': [[имя, ширина]]}.
+    '''
+    with default_storage.open(name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image = image.convert('RGB')
+    stem = os.path.splitext(os.path.basename(name))[0]
+    manifest = []
+    for pil_format, extension, mime in available_formats():
+        files = []
+        for width in _widths(image.width):
+            height = round(width * ASPECT[1] / ASPECT[0])
+            buffer = BytesIO()
+            ImageOps.fit(image, (width, height)).save(
+                buffer, pil_format, quality=QUALITY
+            )
+            files.append([
+                _save(
+                    f'{VARIANTS_DIR}/{stem}-{width}w.{extension}',
+                    buffer.getvalue()
+                ),
+                width
+            ])
+        manifest.append({'type': mime, 'files': files})
+    return manifest
+
+
+@task(unique=True, retry_failed=False)
+def generate_variants(name):
+    '''Строит варианты и записывает их в посты с картинкой name.'''
+    manifest = json.dumps(build_variants(name))
+    posts = Post.objects.filter(image=name)
+    pks = list(posts.values_list('pk', flat=True))
+    posts.update(image_variants=manifest)
+    cache.bump(*(cache.scope('post', pk) for pk in pks))
+    snapshots.schedule_posts(pks)
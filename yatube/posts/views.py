@@ -1,55 +1,138 @@
 from django.core.paginator import Paginator
 from django.shortcuts import redirect, render, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
 
+from core import cache
+from core.cache import scope
+from core.replicas import primary
+
+from . import follows
+from .counters import stats_for
 from .forms import PostForm, CommentForm
-from .models import Follow, Post, Group, User
+from .models import Comment, Post, Group, User
+from .paginators import (
+    CURSOR_PARAM, PAGE_PARAM, CountedCursorPaginator, CursorPaginator,
+    page_state, paginate
+)
+from .search import search as search_posts
+from .threads import load_replies
+from .timeline import get_timeline_page
 
 POSTS_AMOUNT = 10
+COMMENTS_AMOUNT = 20
+# Счётчик постов автора в закэшированной странице поста может отставать
+# на это время; пост и комментарии сбрасываются сразу.
+POST_DETAIL_TIMEOUT = 60
+FEED_FRAGMENT_TEMPLATE = 'posts/includes/post_feed.html'
+
+
+def feed_fragment(request, page_obj, page_name, fragment_name, args=(),
+                  **flags):
+    '''Только карточки постов страницы и ссылка на следующую, для
+    подгрузки ленты при прокрутке.'''
+    context = {
+        'page_obj': page_obj,
+        'page_url': reverse(page_name, args=args),
+        'fragment_url': reverse(fragment_name, args=args),
+        'fragment': True,
+        **flags,
+    }
+    return render(request, FEED_FRAGMENT_TEMPLATE, context)
 
 
-@cache_page(20, key_prefix='index_page')
 def index(request):
     template = 'posts/index.html'
-    posts = Post.objects.select_related('group')
-    paginator = Paginator(posts, POSTS_AMOUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.for_feed()
+    page_obj = paginate(
+        request, posts, POSTS_AMOUNT, scopes=['feed'],
+        paginator_class=CountedCursorPaginator
+    )
     description = 'Последние обновления на сайте'
 
     context = {
         'description': description,
         'page_obj': page_obj,
+        'fragment_url': reverse('posts:index_fragment'),
     }
     return render(request, template, context)
 
 
+def index_fragment(request):
+    posts = Post.objects.for_feed()
+    page_obj = paginate(request, posts, POSTS_AMOUNT, scopes=['feed'])
+    return feed_fragment(
+        request, page_obj, 'posts:index', 'posts:index_fragment',
+        author_shown=True, group_shown=True
+    )
+
+
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all().order_by('-created').select_related(
-        'author'
+    posts = group.posts.for_feed()
+    page_obj = paginate(
+        request, posts, POSTS_AMOUNT, scopes=[scope('group', group.pk)],
+        paginator_class=CountedCursorPaginator
     )
-    paginator = Paginator(posts, POSTS_AMOUNT)
-    page_num = request.GET.get('page')
-    page_obj = paginator.get_page(page_num)
 
     context = {
         'group': group,
         'page_obj': page_obj,
+        'fragment_url': reverse('posts:group_list_fragment', args=[slug]),
     }
     return render(request, template, context)
 
 
+def group_posts_fragment(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    posts = group.posts.for_feed()
+    page_obj = paginate(
+        request, posts, POSTS_AMOUNT, scopes=[scope('group', group.pk)]
+    )
+    return feed_fragment(
+        request, page_obj, 'posts:group_list', 'posts:group_list_fragment',
+        [slug], author_shown=True
+    )
+
+
+def paginate_comments(request, post_id):
+    '''Страница комментариев верхнего уровня с авторами и ветками
+    ответов.'''
+    comments = Comment.objects.filter(
+        post_id=post_id, depth=0
+    ).select_related('author')
+    page = paginate(request, comments, COMMENTS_AMOUNT)
+    load_replies(page.object_list)
+    return page
+
+
+def post_detail_content(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    comments = paginate_comments(request, post.pk)
+    return post, stats_for(post.author), page_state(comments)
+
+
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    comments = list(post.comments.all())
+    key = cache.make_key(
+        'post_detail', [scope('post', post_id)],
+        request.GET.get(CURSOR_PARAM), request.GET.get(PAGE_PARAM)
+    )
+    post, author_stats, comments = cache.get_or_compute(
+        key, lambda: post_detail_content(request, post_id),
+        POST_DETAIL_TIMEOUT
+    )
+    comments = CursorPaginator(
+        Comment.objects.none(), COMMENTS_AMOUNT
+    ).restore_page(comments)
     comments_form = CommentForm()
 
     context = {
         'post': post,
+        'author_stats': author_stats,
         'comments': comments,
         'comments_form': comments_form,
     }
@@ -57,31 +140,91 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    template = 'posts/includes/comment_list.html'
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+
+    context = {
+        'post': post,
+        'comments': paginate_comments(request, post.pk),
+    }
+    return render(request, template, context)
+
+
+def comment_replies(request, post_id, comment_id):
+    template = 'posts/includes/comment_replies.html'
+    comment = get_object_or_404(
+        Comment.objects.select_related('author'),
+        pk=comment_id,
+        post_id=post_id
+    )
+    load_replies([comment])
+
+    context = {
+        'replies': comment.shown_replies,
+    }
+    return render(request, template, context)
+
+
 def profile(request, username):
     template = 'posts/profile.html'
     user = request.user
-    author = get_object_or_404(User, username=username)
-    following = user.is_authenticated and Follow.objects.filter(
-        user=user, author=author
-    ).exists()
-    posts = author.posts.all().select_related('group')
-    posts_num = posts.count()
-    paginator = Paginator(posts, POSTS_AMOUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats = stats_for(author)
+    following = follows.is_following(user, author.pk)
+    posts = author.posts.for_feed()
+    page_obj = paginate(
+        request, posts, POSTS_AMOUNT, scopes=[scope('author', author.pk)],
+        paginator_class=CountedCursorPaginator, count=stats.posts_count
+    )
     description = f'Профайл пользователя {username}'
 
     context = {
         'description': description,
         'author': author,
-        'posts_num': posts_num,
+        'posts_num': stats.posts_count,
+        'stats': stats,
         'page_obj': page_obj,
         'following': following,
+        'fragment_url': reverse('posts:profile_fragment', args=[username]),
     }
 
     return render(request, template, context)
 
 
+def profile_fragment(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    posts = author.posts.for_feed()
+    page_obj = paginate(
+        request, posts, POSTS_AMOUNT, scopes=[scope('author', author.pk)]
+    )
+    return feed_fragment(
+        request, page_obj, 'posts:profile', 'posts:profile_fragment',
+        [username], group_shown=True
+    )
+
+
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = Paginator(search_posts(query), POSTS_AMOUNT).get_page(
+        request.GET.get('page')
+    )
+    posts = Post.objects.for_feed().in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts
+    ]
+
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
+@primary
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -99,6 +242,7 @@ def post_create(request):
     return render(request, template, context)
 
 
+@primary
 @login_required
 def post_edit(request, post_id):
     template = 'posts/create_post.html'
@@ -123,13 +267,15 @@ def post_edit(request, post_id):
     return render(request, template, context)
 
 
+@primary
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    comments_form = CommentForm(request.POST or None)
+    comments_form = CommentForm(request.POST or None, post_id=post.pk)
     if comments_form.is_valid():
         comments_form.instance.author = request.user
         comments_form.instance.post = post
+        comments_form.instance.parent = comments_form.cleaned_data['parent']
         comments_form.save()
     return redirect('posts:post_detail', post_id=post_id)
 
@@ -137,45 +283,45 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     user = request.user
-    followings = Follow.objects.filter(user=user)
     message = ''
-    if not followings:
+    if not follows.following(user.pk):
         message = (
             'Подпишитесь на кого-нибудь, '
             'чтобы следить за их обновлениями'
         )
-    posts = Post.objects.filter(
-        author__following__user=user
-    )
-    paginator = Paginator(posts, POSTS_AMOUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_timeline_page(request, user, POSTS_AMOUNT)
     description = 'Последние обновления у избранных авторов'
     context = {
         'description': description,
         'page_obj': page_obj,
         'message': message,
+        'fragment_url': reverse('posts:follow_index_fragment'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@login_required
+def follow_index_fragment(request):
+    page_obj = get_timeline_page(request, request.user, POSTS_AMOUNT)
+    return feed_fragment(
+        request, page_obj, 'posts:follow_index',
+        'posts:follow_index_fragment', author_shown=True, group_shown=True
+    )
+
+
+@primary
 @login_required
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    if user != author:
-        Follow.objects.get_or_create(
-            user=user,
-            author=author
-        )
+    follows.follow(user, author)
     return redirect('posts:profile', username=username)
 
 
+@primary
 @login_required
 def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    following = Follow.objects.filter(user=user, author=author).exists()
-    if following:
-        Follow.objects.filter(user=user, author=author).delete()
+    follows.unfollow(user, author)
     return redirect('posts:profile', username=username)
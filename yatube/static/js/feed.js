@@ -0,0 +1,69 @@
+// Подгружает следующие страницы ленты при прокрутке: сервер отдаёт
+// только карточки постов, без шапки и подвала страницы.
+(function () {
+  var observer = null;
+
+  function load(link) {
+    if (link.dataset.loading) {
+      return;
+    }
+    link.dataset.loading = 'true';
+    fetch(link.dataset.fragment)
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error(response.statusText);
+        }
+        return response.text();
+      })
+      .then(function (html) {
+        link.insertAdjacentHTML('beforebegin', html);
+        if (observer) {
+          observer.unobserve(link);
+        }
+        link.remove();
+        activate();
+      })
+      .catch(function () {
+        window.location = link.href;
+      });
+  }
+
+  function activate() {
+    document.querySelectorAll('[data-feed-more][hidden]').forEach(
+      function (link) {
+        link.hidden = false;
+        if (observer) {
+          observer.observe(link);
+        }
+      }
+    );
+  }
+
+  if ('IntersectionObserver' in window) {
+    observer = new IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+          load(entry.target);
+        }
+      });
+    }, {rootMargin: '400px'});
+  }
+
+  document.addEventListener('click', function (event) {
+    var link = event.target.closest('[data-feed-more]');
+    if (link) {
+      event.preventDefault();
+      load(link);
+    }
+  });
+
+  // Номера страниц устаревают после первой подгрузки.
+  if (document.querySelector('[data-feed-more]')) {
+    document.querySelectorAll('[data-feed-pagination]').forEach(
+      function (nav) {
+        nav.remove();
+      }
+    );
+  }
+  activate();
+})();
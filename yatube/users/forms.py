@@ -1,6 +1,8 @@
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
 from django.contrib.auth import get_user_model
 
+from .tasks import send_password_reset
+
 
 User = get_user_model()
 
@@ -15,3 +17,21 @@ class LoginForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('username',)
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    '''Письмо для сброса пароля отправляется из фоновой очереди.'''
+
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        # Ссылка с токеном собирается в задаче и не хранится в очереди.
+        send_password_reset.delay(
+            context['user'].pk, to_email,
+            {
+                key: context[key]
+                for key in ('domain', 'site_name', 'protocol')
+            },
+            subject_template_name, email_template_name, from_email,
+            html_email_template_name,
+        )
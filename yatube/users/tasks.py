@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives
+from django.template import loader
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core.tasks import task
+
+User = get_user_model()
+
+
+@task
+def send_password_reset(user_id, to_email, context, subject_template_name,
+                        email_template_name, from_email=None,
+                        html_email_template_name=None):
+    '''Отправляет письмо для сброса пароля из фоновой очереди.
+
+    Токен и ссылка создаются здесь, поэтому в строке задачи хранятся
+    только id пользователя, адрес и сведения о сайте.
+    '''
+    user = User.objects.filter(pk=user_id, is_active=True).first()
+    if user is None:
+        return
+    context = {
+        **context,
+        'email': to_email,
+        'user': user,
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': default_token_generator.make_token(user),
+    }
+    subject = loader.render_to_string(subject_template_name, context)
+    subject = ''.join(subject.splitlines())
+    body = loader.render_to_string(email_template_name, context)
+    message = EmailMultiAlternatives(subject, body, from_email, [to_email])
+    if html_email_template_name is not None:
+        message.attach_alternative(
+            loader.render_to_string(html_email_template_name, context),
+            'text/html'
+        )
+    message.send()
@@ -1,5 +1,9 @@
+import re
 from http import HTTPStatus
+from django.core import mail
 from django.test import TestCase, Client
+from core import tasks
+from core.models import Task
 from posts.models import User
 
 
@@ -81,3 +85,25 @@ class UserURLTests(TestCase):
                 except AssertionError:
                     response = self.authorized_client.get(address)
                     self.assertTemplateUsed(response, template)
+
+    def test_password_reset_email_is_queued(self):
+        """Письмо для сброса пароля уходит через фоновую очередь."""
+        User.objects.create_user(
+            username='reset', email='reset@example.com', password='secret'
+        )
+        response = self.guest_client.post(
+            '/auth/password_reset/', {'email': 'reset@example.com'}
+        )
+        self.assertRedirects(response, '/auth/password_reset/done/')
+        self.assertEqual(len(mail.outbox), 0)
+        task = Task.objects.get()
+        self.assertEqual(task.name, 'users.tasks.send_password_reset')
+        self.assertNotIn('/auth/reset/', task.arguments)
+        tasks.run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reset@example.com'])
+        link = re.search(r'/auth/reset/\S+/\S+/', mail.outbox[0].body)
+        response = self.guest_client.get(link.group())
+        self.assertRedirects(
+            response, link.group().rsplit('/', 2)[0] + '/set-password/'
+        )
@@ -1,5 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views
+from .forms import QueuedPasswordResetForm
 from .views import SignUp
 
 
@@ -24,7 +25,8 @@ urlpatterns = [
     path(
         'password_reset/',
         views.PasswordResetView.as_view(
-            template_name='users/password_reset_form.html'
+            template_name='users/password_reset_form.html',
+            form_class=QueuedPasswordResetForm
         ),
         name='password_reset'
     ),
@@ -46,11 +46,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -65,7 +67,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.profiling.ProfiledTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -90,9 +92,30 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение переиспользуется запросами потока до минуты
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# PRAGMA для каждого нового соединения SQLite (core.sqlite): журнал WAL,
+# synchronous=NORMAL, mmap и ожидание блокировки; {} — настройки SQLite
+# по умолчанию
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+# Реплики для чтения лент: алиасы из DATABASES, например
+# 'replica1': {'ENGINE': ..., 'NAME': os.path.join(BASE_DIR, 'replica1.sqlite3')}.
+# Запросы пользователя после записи REPLICA_PIN_SECONDS секунд читают
+# из основной базы.
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+REPLICA_DATABASES = []
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -147,8 +170,38 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+THUMBNAIL_BACKEND = 'posts.thumbnails.AsyncThumbnailBackend'
+# Фоновые задачи (core.tasks: миниатюры, копии страниц, письма) выполняет
+# manage.py runworker; True — выполнять в том же процессе сразу после
+# коммита, без воркера
+TASKS_EAGER = False
+
+# Статические копии первых SNAPSHOT_PAGES страниц групп и профилей для
+# анонимных читателей (posts.snapshots), например
+# os.path.join(BASE_DIR, 'snapshots'); None — копии не пишутся
+SNAPSHOT_ROOT = None
+SNAPSHOT_PAGES = 3
+
+# Доля профилируемых запросов и период записи гистограмм в лог
+# core.profiler (в секундах); гистограммы также отдаются на /metrics
+PROFILER_SAMPLE_RATE = 0.1
+PROFILER_LOG_INTERVAL = 60
+
+# Общий для всех воркеров кэш в файле SQLite (core.cache_backend):
+# MAX_ENTRIES записей и MAX_SIZE байт значений, при превышении
+# вытесняются давно не читавшиеся. Подойдёт и любой другой бэкенд
+# Django, например Redis через django-redis или LocMemCache для одного
+# процесса.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backend.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
+
+# Тесты используют кэш в памяти (core.runner.TEST_CACHES), а не общий файл
+TEST_RUNNER = 'core.runner.TestRunner'